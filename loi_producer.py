@@ -1,14 +1,63 @@
 import re
+import argparse
 import datetime
-import locale
 import logging
-from typing import Any
+import multiprocessing
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 import docx2pdf
 from num2words import num2words
 import pandas as pd
 
 from docxtpl import DocxTemplate, InlineImage, RichText
-from loi_producer_config import *
+from loi_producer_cache import RenderCache, get_render_cache_key
+from loi_producer_config import (
+    DEFAULT_LOG_FILE_MODE,
+    DEFAULT_LOG_LEVEL,
+    DEFAULT_LOG_MESSAGE_FORMAT,
+    DEFAULT_LOGGER_NAME,
+)
+from loi_producer_memory import MemoryGovernor
+from loi_producer_number_format import format_indian_number, format_indian_numbers
+from loi_producer_settings import (
+    DEFAULT_SETTINGS,
+    LoiProducerSettings,
+    add_settings_arguments,
+    settings_from_arguments,
+)
+from loi_producer_shard import (
+    merge_shard_manifests,
+    select_shard_rows,
+    write_shard_manifest,
+)
+from loi_producer_template import SkeletonRenderer, analyse_template
+
+# Columns of the sheets which are read to build the context entries that are not
+# auto-mapped from a column of the same name
+CANDIDATE_DERIVED_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "ctcInWord": ("totalCtcPerYear",),
+    "candidateSignature": ("candidateSignature",),
+    "offerDate": ("offerDate",),
+}
+COMPANY_DERIVED_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "companyLogo": ("companyLogo",),
+    "hrSignature": ("hrSignature",),
+    "webSiteLink": ("webSiteAlias", "webSiteLink"),
+}
+# Context entries which do not come from the sheets
+BATCH_CONTEXT_VARIABLES: FrozenSet[str] = frozenset({"todayDate"})
+# Start method of the worker processes used to enforce the RSS budget,
+# None uses the default start method of the platform
+WORKER_START_METHOD: Optional[str] = None
 
 
 def configure_logger(
@@ -129,6 +178,7 @@ def configure_rich_text_date_of_offer(
     candidate_dataframe: pd.DataFrame,
     candidate_index: int,
     logger_object: logging.Logger,
+    settings: LoiProducerSettings = DEFAULT_SETTINGS,
 ) -> RichText:
     """
     This function is used for configuring the rich text object for
@@ -139,6 +189,7 @@ def configure_rich_text_date_of_offer(
         candidate_dataframe (pd.DataFrame): The Pandas DataFrame containing candidate information
         candidate_index (int): The row index of the candidate in the dataframe
         logger_object (logging.Logger): The logger object which is used to log the information
+        settings (LoiProducerSettings): The runtime settings of the batch
 
     Returns:
         The configured RichText object
@@ -160,7 +211,7 @@ def configure_rich_text_date_of_offer(
     )  # for superscripting the position of the day
 
     rich_text_object.add(
-        text=offer_date.strftime(DEFAULT_OFFER_DATE_MONTH_YEAR_FORMAT),
+        text=offer_date.strftime(settings.offer_date_month_year_format),
         size=22,
         color="black",
     )
@@ -182,8 +233,32 @@ def get_file_extension(file_name: str):
     return match.group(3) if match else ""
 
 
+def get_formatted_numeric_columns(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function formats every integer column of the `dataframe` at once
+    with the Indian digit grouping
+
+    Args:
+        dataframe (pd.DataFrame): The Pandas DataFrame containing information of company/candidate.
+
+    Returns:
+        pd.DataFrame: The formatted integer columns, with the index of the `dataframe`
+    """
+    return pd.DataFrame(
+        {
+            column_header: format_indian_numbers(dataframe[column_header].to_numpy())
+            for column_header in dataframe.columns
+            if dataframe[column_header].dtype == "int64"
+        },
+        index=dataframe.index,
+    )
+
+
 def get_automapped_numeric_and_string_context(
-    dataframe: pd.DataFrame, row_identifier: Any
+    dataframe: pd.DataFrame,
+    row_identifier: Any,
+    settings: LoiProducerSettings = DEFAULT_SETTINGS,
+    formatted_numeric_columns: Optional[pd.DataFrame] = None,
 ):
     """
 
@@ -191,6 +266,9 @@ def get_automapped_numeric_and_string_context(
     Args:
         dataframe (pd.DataFrame): The Pandas DataFrame containing information of company/candidate.
         row_identifier (str): The identifier to uniquely identify each row of the `dataframe`
+        settings (LoiProducerSettings): The runtime settings of the batch
+        formatted_numeric_columns (Optional[pd.DataFrame]): The integer columns of the `dataframe`
+            formatted by `get_formatted_numeric_columns`. The cells are formatted one by one if not given
 
     Returns:
         It returns dictionary containing auto-mapped information of company/candidate.
@@ -199,14 +277,14 @@ def get_automapped_numeric_and_string_context(
     numeric_and_string_context: dict = {}
     for column_header in dataframe.columns:
         if dataframe[column_header].dtype == "int64":
-            numeric_and_string_context[column_header] = locale.format_string(
-                f="%d",
-                val=dataframe.loc[row_identifier, column_header],
-                grouping=True,
+            numeric_and_string_context[column_header] = (
+                format_indian_number(dataframe.loc[row_identifier, column_header])
+                if formatted_numeric_columns is None
+                else formatted_numeric_columns.loc[row_identifier, column_header]
             )
         elif dataframe[column_header].dtype == "object" and not (
             get_file_extension(file_name=dataframe.loc[row_identifier, column_header])
-            in ACCEPTABLE_IMAGE_FORMATS
+            in settings.acceptable_image_formats
         ):
             numeric_and_string_context[column_header] = dataframe.loc[
                 row_identifier, column_header
@@ -220,6 +298,9 @@ def populate_candidate_context(
     candidate_dataframe: pd.DataFrame,
     candidate_index: int,
     logger_object: logging.Logger,
+    settings: LoiProducerSettings = DEFAULT_SETTINGS,
+    template_variables: Optional[Collection[str]] = None,
+    formatted_numeric_columns: Optional[pd.DataFrame] = None,
 ) -> dict:
     """
 
@@ -228,38 +309,49 @@ def populate_candidate_context(
         candidate_dataframe (pd.DataFrame): The Pandas DataFrame containing candidate information
         candidate_index (int): The row index of the candidate in the dataframe
         logger_object (logging.Logger): The logger object which is used to log the information
+        settings (LoiProducerSettings): The runtime settings of the batch
+        template_variables (Optional[Collection[str]]): The variables referenced by the template,
+            only these derived entries are built. All of them are built if not given
+        formatted_numeric_columns (Optional[pd.DataFrame]): The integer columns of the
+            `candidate_dataframe` formatted by `get_formatted_numeric_columns`
 
     Returns:
         a dictionary populated with the details of the candidate information whose row index in the dataframe
         matches with the parameter `row_identifier`
     """
     context: dict = {"candidateName": ""}
+    derived_context_builders: Dict[str, Callable[[], Any]] = {
+        "ctcInWord": lambda: (
+            num2words(
+                number=candidate_dataframe.loc[candidate_index, "totalCtcPerYear"],
+                lang=settings.num2words_language,
+            )
+            .title()
+            .replace(",", "")
+        ),  # title styling i.e. first letter of each word in upper case
+        "candidateSignature": lambda: InlineImage(
+            tpl=template,
+            image_descriptor=settings.image_path
+            + candidate_dataframe.loc[
+                candidate_index, "candidateSignature"  # path to the image
+            ],
+            height=settings.candidate_signature_img_height,
+            width=settings.candidate_signature_img_width,
+        ),
+    }
     try:
         context = (
             context
             | get_automapped_numeric_and_string_context(
-                dataframe=candidate_dataframe, row_identifier=candidate_index
+                dataframe=candidate_dataframe,
+                row_identifier=candidate_index,
+                settings=settings,
+                formatted_numeric_columns=formatted_numeric_columns,
             )
             | {
-                "ctcInWord": (
-                    num2words(
-                        number=candidate_dataframe.loc[
-                            candidate_index, "totalCtcPerYear"
-                        ],
-                        lang=DEFAULT_NUM2WORDS_LANGUAGE,
-                    )
-                    .title()
-                    .replace(",", "")
-                ),  # title styling i.e. first letter of each word in upper case
-                "candidateSignature": InlineImage(
-                    tpl=template,
-                    image_descriptor=IMAGE_PATH
-                    + candidate_dataframe.loc[
-                        candidate_index, "candidateSignature"  # path to the image
-                    ],
-                    height=CANDIDATE_SIGNATURE_IMG_HEIGHT,
-                    width=CANDIDATE_SIGNATURE_IMG_WIDTH,
-                ),
+                name: build_entry()
+                for name, build_entry in derived_context_builders.items()
+                if template_variables is None or name in template_variables
             }
         )
 
@@ -279,6 +371,8 @@ def populate_company_context(
     company_dataframe: pd.DataFrame,
     company_name: str,
     logger_object: logging.Logger,
+    settings: LoiProducerSettings = DEFAULT_SETTINGS,
+    template_variables: Optional[Collection[str]] = None,
 ) -> dict:
     """
     This function takes the Dataframe having company information in it along with
@@ -290,38 +384,44 @@ def populate_company_context(
         company_dataframe (pd.DataFrame): The Pandas DataFrame containing company information
         company_name (str): Name of the
         logger_object (logging.Logger): The logger object which is used to log the information
+        settings (LoiProducerSettings): The runtime settings of the batch
+        template_variables (Optional[Collection[str]]): The variables referenced by the template,
+            only these images are built. All of them are built if not given
 
     Returns:
         a dictionary populated with the details of the company information whose name matches
         with the parameter`company_name`
     """
     context: dict = {"companyName": ""}
+    derived_context_builders: Dict[str, Callable[[], Any]] = {
+        "companyLogo": lambda: InlineImage(
+            tpl=template,
+            image_descriptor=settings.image_path
+            + company_dataframe.loc[company_name, "companyLogo"],  # path to the image
+            height=settings.company_logo_img_height,
+            width=settings.company_logo_img_width,
+        ),
+        "hrSignature": lambda: InlineImage(
+            tpl=template,
+            image_descriptor=settings.image_path
+            + company_dataframe.loc[company_name, "hrSignature"],  # path to the image
+            height=settings.hr_signature_img_height,
+            width=settings.hr_signature_img_width,
+        ),
+    }
     try:
         context = (
             context
             | get_automapped_numeric_and_string_context(
-                dataframe=company_dataframe, row_identifier=company_name
+                dataframe=company_dataframe,
+                row_identifier=company_name,
+                settings=settings,
             )
+            | {"companyName": company_name}
             | {
-                "companyName": company_name,
-                "companyLogo": InlineImage(
-                    tpl=template,
-                    image_descriptor=IMAGE_PATH
-                    + company_dataframe.loc[
-                        company_name, "companyLogo"
-                    ],  # path to the image
-                    height=COMPANY_LOGO_IMG_HEIGHT,
-                    width=COMPANY_LOGO_IMG_WIDTH,
-                ),
-                "hrSignature": InlineImage(
-                    tpl=template,
-                    image_descriptor=IMAGE_PATH
-                    + company_dataframe.loc[
-                        company_name, "hrSignature"
-                    ],  # path to the image
-                    height=HR_SIGNATURE_IMG_HEIGHT,
-                    width=HR_SIGNATURE_IMG_WIDTH,
-                ),
+                name: build_entry()
+                for name, build_entry in derived_context_builders.items()
+                if template_variables is None or name in template_variables
             }
         )
         logger_object.debug(
@@ -335,12 +435,144 @@ def populate_company_context(
         return context
 
 
+def get_required_columns(
+    template_variables: Collection[str],
+    derived_columns: Dict[str, Tuple[str, ...]],
+    key_column: str,
+) -> FrozenSet[str]:
+    """
+    This function returns the columns of a sheet which are needed to render the template,
+    i.e. the key column, the columns referenced by the template and the columns
+    from which the referenced derived entries are built
+
+    Args:
+        template_variables (Collection[str]): The variables referenced by the template
+        derived_columns (Dict[str, Tuple[str, ...]]): The columns used by each derived entry
+        key_column (str): The column identifying each row, e.g. `candidateName`
+
+    Returns:
+        FrozenSet[str]: The names of the required columns
+
+    Example:
+        >>> sorted(get_required_columns({"hra", "ctcInWord"}, CANDIDATE_DERIVED_COLUMNS, "candidateName"))
+        ['candidateName', 'ctcInWord', 'hra', 'totalCtcPerYear']
+    """
+    required_columns = {key_column, *template_variables}
+    for name, columns in derived_columns.items():
+        if name in template_variables:
+            required_columns.update(columns)
+    return frozenset(required_columns)
+
+
+def read_sheet(
+    sheet_path: str,
+    required_columns: Optional[Collection[str]] = None,
+    **read_excel_options: Any,
+) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    This function reads a sheet to a pandas dataframe, keeping only the `required_columns`
+
+    Args:
+        sheet_path (str): Path to the sheet
+        required_columns (Optional[Collection[str]]): The columns to read, all of them if not given
+        **read_excel_options: Further arguments of `pd.read_excel`, e.g. `index_col`
+
+    Returns:
+        Tuple[pd.DataFrame, List[str]]: The dataframe and the names of all the columns of the sheet
+    """
+    sheet_columns: List[str] = []
+
+    def select_column(column: str) -> bool:
+        sheet_columns.append(column)  # pandas asks for every column of the header
+        return required_columns is None or column in required_columns
+
+    dataframe = pd.read_excel(sheet_path, usecols=select_column, **read_excel_options)
+    return dataframe, sheet_columns
+
+
+def preflight_template(
+    template_variables: Collection[str],
+    candidate_columns: Collection[str],
+    company_columns: Collection[str],
+    logger_object: logging.Logger,
+) -> Tuple[FrozenSet[str], Dict[str, FrozenSet[str]]]:
+    """
+    This function compares the variables referenced by the template with the columns
+    of the sheets and logs the variables which no column provides and the columns
+    which the template never uses, before the batch starts
+
+    Args:
+        template_variables (Collection[str]): The variables referenced by the template
+        candidate_columns (Collection[str]): All the columns of the candidate sheet
+        company_columns (Collection[str]): All the columns of the company sheet
+        logger_object (logging.Logger): The logger object which is used to log the information
+
+    Returns:
+        Tuple[FrozenSet[str], Dict[str, FrozenSet[str]]]: The undefined variables and
+        the unused columns of each sheet
+    """
+    template_variables = frozenset(template_variables)
+    # the columns which each derived entry is missing to be built
+    missing_derived_columns = {
+        name: frozenset(columns) - frozenset(sheet_columns)
+        for derived_columns, sheet_columns in (
+            (CANDIDATE_DERIVED_COLUMNS, candidate_columns),
+            (COMPANY_DERIVED_COLUMNS, company_columns),
+        )
+        for name, columns in derived_columns.items()
+    }
+    # a derived entry replaces any column of the same name, so it is only
+    # defined when all of the columns it is built from are present
+    undefined_variables = (
+        template_variables
+        - missing_derived_columns.keys()
+        - set(candidate_columns)
+        - set(company_columns)
+        - BATCH_CONTEXT_VARIABLES
+    ) | {
+        name
+        for name, columns in missing_derived_columns.items()
+        if columns and name in template_variables
+    }
+    unused_columns = {
+        "CandidateInformation": frozenset(candidate_columns)
+        - get_required_columns(
+            template_variables, CANDIDATE_DERIVED_COLUMNS, "candidateName"
+        ),
+        "CompanyInformation": frozenset(company_columns)
+        - get_required_columns(
+            template_variables, COMPANY_DERIVED_COLUMNS, "companyName"
+        ),
+    }
+    if undefined_variables:
+        logger_object.warning(
+            "The template references undefined variables: "
+            + ", ".join(
+                (
+                    f"{name} (missing columns: {', '.join(sorted(missing_derived_columns[name]))})"
+                    if name in missing_derived_columns
+                    else name
+                )
+                for name in sorted(undefined_variables)
+            )
+        )
+    for sheet_name, columns in unused_columns.items():
+        if columns:
+            logger_object.info(
+                f"The columns of {sheet_name} which the template does not use: {', '.join(sorted(columns))}"
+            )
+    return undefined_variables, unused_columns
+
+
 def render_and_produce_PDF(
     template: DocxTemplate,
     context_information: dict,
     candidate_name: str,
     logger_object: logging.Logger,
-) -> None:
+    settings: LoiProducerSettings = DEFAULT_SETTINGS,
+    renderer: Optional[SkeletonRenderer] = None,
+    render_cache: Optional[RenderCache] = None,
+) -> Dict[str, str]:
     """
     This function renders the `context_information` in the template and produces
     LOIs in pdf format with name as `<candidate_name>_LOI.pdf`
@@ -350,129 +582,446 @@ def render_and_produce_PDF(
         context_information (dict): Dictionary containing information that is to be rendered in the template
         candidate_name (str): Name of the candidate for which offer letter is to be generated
         logger_object (logging.Logger): The logger object which is used to log the information
+        settings (LoiProducerSettings): The runtime settings of the batch
+        renderer (Optional[SkeletonRenderer]): The renderer of the `template`, when rendering by equivalence class
+        render_cache (Optional[RenderCache]): The cache of the rendered LOIs, when caching is enabled
+
+    Returns:
+        Dict[str, str]: The path of the produced file of each file extension
     """
     candidate_name = candidate_name.strip().replace(" ", "_")
-    template.render(
-        context=context_information
-    )  # rendering the context information in the template
+    docx_file_path = (
+        settings.output_docx_root_path
+        + candidate_name
+        + settings.output_file_ending_format
+        + ".docx"
+    )
+    pdf_file_path = (
+        settings.output_pdf_root_path
+        + candidate_name
+        + settings.output_file_ending_format
+        + ".pdf"
+    )
+    output_file_paths = {"docx": docx_file_path, "pdf": pdf_file_path}
+    if render_cache:
+        cache_key = get_render_cache_key(context=context_information, template=template)
+        if render_cache.restore(key=cache_key, destinations=output_file_paths):
+            logger_object.debug(
+                f"The loi has been restored from the render cache for the candidate {candidate_name}"
+            )
+            return output_file_paths
+    if renderer:
+        renderer.render(context=context_information)
+    else:
+        template.render(
+            context=context_information
+        )  # rendering the context information in the template
     logger_object.debug(
         f"The context information has been rendered successfully to the template for the candidate {candidate_name}"
     )
-    template.save(
-        OUTPUT_DOCX_ROOT_PATH + candidate_name + OUTPUT_FILE_ENDING_FORMAT + ".docx"
-    )  # saving the populated docx file
+    template.save(docx_file_path)  # saving the populated docx file
     logger_object.debug(
         f"The word document has been generated successfully for the candidate {candidate_name}"
     )
     docx2pdf.convert(
-        input_path=OUTPUT_DOCX_ROOT_PATH
-        + candidate_name
-        + OUTPUT_FILE_ENDING_FORMAT
-        + ".docx",
-        output_path=OUTPUT_PDF_ROOT_PATH
-        + candidate_name
-        + OUTPUT_FILE_ENDING_FORMAT
-        + ".pdf",
+        input_path=docx_file_path,
+        output_path=pdf_file_path,
     )  # converting the produced *.docx files to PDF files
     logger_object.debug(
         f"The pdf loi has been generated successfully for the candidate {candidate_name}"
     )
+    if render_cache:
+        render_cache.store(key=cache_key, sources=output_file_paths)
+    return output_file_paths
 
 
-def main(company_name: str, logger_object: logging.Logger) -> None:
+def configure_memory_governor(
+    logger_object: logging.Logger, settings: LoiProducerSettings = DEFAULT_SETTINGS
+) -> MemoryGovernor:
+    """
+    This function creates the memory governor configured by the `settings`
+
+    Args:
+        logger_object (logging.Logger): The logger object which is used to log the information
+        settings (LoiProducerSettings): The runtime settings of the batch
+
+    Returns:
+        MemoryGovernor: The memory governor of the batch
+    """
+    return MemoryGovernor(
+        logger_object=logger_object,
+        snapshot_interval=settings.memory_snapshot_interval,
+        gc_interval=settings.memory_gc_interval,
+        rss_budget_bytes=settings.memory_rss_budget_bytes,
+        top_allocations=settings.memory_report_top_allocations,
+    )
+
+
+def produce_letters(
+    candidate_indices: Sequence[int],
+    candidate_information: pd.DataFrame,
+    company_information: pd.DataFrame,
+    logger_object: logging.Logger,
+    memory_governor: MemoryGovernor,
+    settings: LoiProducerSettings = DEFAULT_SETTINGS,
+    template_variables: Optional[FrozenSet[str]] = None,
+) -> Dict[int, Dict[str, str]]:
+    """
+    This function produces the LOIs of the candidates at `candidate_indices`, in order.
+    It stops early when the `memory_governor` finds the RSS over its budget, so that
+    the remaining LOIs are produced by a new worker process.
+
+    Args:
+        candidate_indices (Sequence[int]): The row indices of the candidates
+        candidate_information (pd.DataFrame): The Pandas DataFrame containing candidate information
+        company_information (pd.DataFrame): The Pandas DataFrame containing company information
+        logger_object (logging.Logger): The logger object which is used to log the information
+        memory_governor (MemoryGovernor): The memory governor of the process
+        settings (LoiProducerSettings): The runtime settings of the batch
+        template_variables (Optional[FrozenSet[str]]): The variables referenced by the template,
+            only these context entries are built. All of them are built if not given
+
+    Returns:
+        Dict[int, Dict[str, str]]: The paths of the files produced for each row index
+    """
+    company_name = settings.company_name
+    # Initializing the Document Template by specifying the path to the template document file
+    document: DocxTemplate = DocxTemplate(settings.docx_template_path)
+    # Analysing the template once, so that the documents of candidates which only
+    # differ in plain text substitutions share a single jinja rendering
+    renderer: Optional[SkeletonRenderer] = (
+        SkeletonRenderer(template=document)
+        if settings.render_by_equivalence_class
+        else None
+    )
+    # Answering repeated requests for the same LOI from the content-addressed cache
+    render_cache: Optional[RenderCache] = (
+        RenderCache(
+            cache_path=settings.render_cache_path,
+            max_bytes=settings.render_cache_max_bytes,
+        )
+        if settings.render_cache_path
+        else None
+    )
+    # getting the company information
+    company_context = populate_company_context(
+        template=document,
+        company_dataframe=company_information,
+        company_name=company_name,
+        logger_object=logger_object,
+        settings=settings,
+        template_variables=template_variables,
+    )
+    produced_files: Dict[int, Dict[str, str]] = {}
+    # Formatting the amounts of all candidates at once instead of cell by cell
+    formatted_candidate_numbers = get_formatted_numeric_columns(candidate_information)
+
+    for candidate_index in candidate_indices:
+        with memory_governor.track_stage("context"):
+            # getting the candidate information
+            candidate_context = populate_candidate_context(
+                template=document,
+                candidate_dataframe=candidate_information,
+                candidate_index=candidate_index,
+                logger_object=logger_object,
+                settings=settings,
+                template_variables=template_variables,
+                formatted_numeric_columns=formatted_candidate_numbers,
+            )
+            # merging both the candidate and company information
+            context = {
+                **candidate_context,
+                **company_context,
+                "todayDate": datetime.date.today().strftime(settings.date_time_format),
+            }
+
+            if template_variables is None or "webSiteLink" in template_variables:
+                # Initializing the rich text object for embedding a URL in the document.
+                # the URL is used for specifying the website of the company which is clickable
+                context["webSiteLink"] = configure_rich_text_web_link(
+                    template=document,
+                    company_dataframe=company_information,
+                    company_name=company_name,
+                    logger_object=logger_object,
+                )
+
+            if template_variables is None or "offerDate" in template_variables:
+                # Configuring Rich Text Object for date of offer
+                context["offerDate"] = configure_rich_text_date_of_offer(
+                    candidate_dataframe=candidate_information,
+                    candidate_index=candidate_index,
+                    logger_object=logger_object,
+                    settings=settings,
+                )
+        with memory_governor.track_stage("render"):
+            produced_files[candidate_index] = render_and_produce_PDF(
+                template=document,
+                context_information=context,
+                candidate_name=candidate_context["candidateName"] or "CORRUPTED",
+                logger_object=logger_object,
+                settings=settings,
+                renderer=renderer,
+                render_cache=render_cache,
+            )
+
+        if candidate_context["candidateName"]:
+            logger_object.info(
+                "LOI for %s has been generated" % candidate_context["candidateName"]
+            )
+
+        if memory_governor.record_letter():
+            break
+
+    if renderer:
+        logger_object.debug(
+            f"{renderer.substitution_renders} LOIs have been rendered from "
+            f"{renderer.skeleton_renders} template renderings, "
+            f"{renderer.fallback_renders} LOIs have been rendered by DocxTemplate.render"
+        )
+    if render_cache:
+        logger_object.debug(
+            f"Render cache: {render_cache.hits} hits, {render_cache.misses} misses"
+        )
+    return produced_files
+
+
+def produce_letters_in_worker(
+    logger_name: str, configure_worker_logger: bool, **letter_arguments: Any
+) -> Tuple[Dict[int, Dict[str, str]], Dict[str, Any]]:
+    """
+    This function runs `produce_letters` in a worker process with its own memory governor
+
+    Args:
+        logger_name (str): Name of the logger of the batch
+        configure_worker_logger (bool): Whether the logger has to be configured in the worker,
+            i.e. the worker has not been forked and does not inherit the handlers of the parent
+        letter_arguments (Any): The arguments of `produce_letters` but the logger and the governor
+
+    Returns:
+        Tuple[Dict[int, Dict[str, str]], Dict[str, Any]]: The paths of the files produced
+        for each row index and the summary of the memory governor of the worker
+    """
+    logger_object = logging.getLogger(logger_name)
+    if configure_worker_logger and not logger_object.hasHandlers():
+        logger_object = configure_logger(logger_name=logger_name, file_mode="a")
+    memory_governor = configure_memory_governor(
+        logger_object=logger_object, settings=letter_arguments["settings"]
+    )
+    memory_governor.start()
+    try:
+        produced_files = produce_letters(
+            logger_object=logger_object,
+            memory_governor=memory_governor,
+            **letter_arguments,
+        )
+    finally:
+        memory_governor.stop()
+    return produced_files, memory_governor.get_summary()
+
+
+def produce_letters_in_workers(
+    candidate_indices: Sequence[int],
+    logger_object: logging.Logger,
+    memory_governor: MemoryGovernor,
+    **letter_arguments: Any,
+) -> Dict[int, Dict[str, str]]:
+    """
+    This function produces the LOIs in a worker process, which is replaced by a new
+    one whenever its RSS exceeds the budget, until every candidate has been produced
+
+    Args:
+        candidate_indices (Sequence[int]): The row indices of the candidates
+        logger_object (logging.Logger): The logger object which is used to log the information
+        memory_governor (MemoryGovernor): The memory governor of the parent process,
+            which merges the summaries of the workers
+        letter_arguments (Any): The other arguments of `produce_letters`
+
+    Returns:
+        Dict[int, Dict[str, str]]: The paths of the files produced for each row index
+    """
+    remaining_indices = list(candidate_indices)
+    produced_files: Dict[int, Dict[str, str]] = {}
+    worker_context = multiprocessing.get_context(WORKER_START_METHOD)
+    # maxtasksperchild=1 starts a new worker process for every task
+    with worker_context.Pool(processes=1, maxtasksperchild=1) as worker_pool:
+        while remaining_indices:
+            worker_files, worker_summary = worker_pool.apply(
+                produce_letters_in_worker,
+                kwds=dict(
+                    logger_name=logger_object.name,
+                    configure_worker_logger=worker_context.get_start_method() != "fork",
+                    candidate_indices=remaining_indices,
+                    **letter_arguments,
+                ),
+            )
+            memory_governor.merge_summary(worker_summary)
+            produced_files.update(worker_files)
+            remaining_indices = remaining_indices[worker_summary["letters"] :]
+            if remaining_indices:
+                memory_governor.record_recycle(
+                    worker_rss_bytes=worker_summary["rss_bytes"]
+                )
+    return produced_files
+
+
+def main(
+    company_name: Optional[str],
+    logger_object: logging.Logger,
+    settings: LoiProducerSettings = DEFAULT_SETTINGS,
+) -> None:
     """
     This function takes the company name and produces LOIs in pdf format for that company.
     Find pdf files in `/output/pdf/` directory and
     Find document files in `/output/document/` directory inside the root directory
 
     Args:
-        company_name (str): Name of the company for which LOIs should be produced
+        company_name (Optional[str]): Name of the company for which LOIs should be produced,
+        it overrides `settings.company_name` which is used when it is None
         logger_object (logging.Logger): The logger object which is used to log the information
+        settings (LoiProducerSettings): The runtime settings of the batch
 
     """
+    if company_name is not None and company_name != settings.company_name:
+        settings = settings.with_overrides({"company_name": company_name})
+    # the settings are the single source of the company name for the whole batch
+    company_name = settings.company_name
     logger_object.info("LoiProducer has started")
-    # Setting the locale to en_IN with character encoding UTF-8
-    locale.setlocale(category=LOCALE_CATEGORY, locale=LOCALE_TYPE)
 
-    # Initializing the Document Template by specifying the path to the template document file
-    document: DocxTemplate = DocxTemplate(DOCX_TEMPLATE_PATH)
+    # Scanning the template once for the variables it references, so that only
+    # the columns and context entries it uses are read and built
+    template_variables: Optional[FrozenSet[str]] = (
+        analyse_template(DocxTemplate(settings.docx_template_path)).variables
+        if settings.prune_context
+        else None
+    )
+
+    # Tracing the allocations and keeping the RSS within its budget in long batches
+    memory_governor = configure_memory_governor(
+        logger_object=logger_object, settings=settings
+    )
 
     # Reading the Candidate Information to a pandas dataframe
-    candidate_information: pd.DataFrame = pd.read_excel(CANDIDATE_SHEET_PATH)
+    candidate_information, candidate_columns = read_sheet(
+        settings.candidate_sheet_path,
+        required_columns=(
+            None
+            if template_variables is None
+            else get_required_columns(
+                template_variables, CANDIDATE_DERIVED_COLUMNS, "candidateName"
+            )
+        ),
+    )
     logger_object.debug(
         "Candidate Information has been read from CandidateInformation.xlsx successfully"
     )
 
     # Reading the Company Information to a pandas dataframe.
     # The companyName column in the Dataframe is treated as Index.
-    company_information: pd.DataFrame = pd.read_excel(
-        COMPANY_SHEET_PATH, index_col="companyName"
+    company_information, company_columns = read_sheet(
+        settings.company_sheet_path,
+        required_columns=(
+            None
+            if template_variables is None
+            else get_required_columns(
+                template_variables, COMPANY_DERIVED_COLUMNS, "companyName"
+            )
+        ),
+        index_col="companyName",
     )
     logger_object.debug(
         "Company Information has been read from CompanyInformation.xlsx successfully"
     )
-    # getting the company information
-    company_context = populate_company_context(
-        template=document,
-        company_dataframe=company_information,
-        company_name=COMPANY_NAME,
-        logger_object=logger_object,
-    )
-
-    for candidate_index in range(len(candidate_information)):
-        # Initializing the rich text object for embedding a URL in the document.
-        # the URL is used for specifying the website of the company which is clickable
-        rich_text_web_link = configure_rich_text_web_link(
-            template=document,
-            company_dataframe=company_information,
-            company_name=company_name,
+    if template_variables is not None:
+        preflight_template(
+            template_variables=template_variables,
+            candidate_columns=candidate_columns,
+            company_columns=company_columns,
             logger_object=logger_object,
         )
 
-        # Configuring Rich Text Object for date of offer
-        rich_text_date_of_offer = configure_rich_text_date_of_offer(
+    # Producing only the rows of this node's shard when the batch is split across nodes
+    candidate_indices = (
+        select_shard_rows(
             candidate_dataframe=candidate_information,
-            candidate_index=candidate_index,
+            shard_index=settings.shard_index,
+            shard_count=settings.shard_count,
+            strategy=settings.shard_strategy,
+        )
+        if settings.sharded
+        else range(len(candidate_information))
+    )
+    letter_arguments = dict(
+        candidate_indices=candidate_indices,
+        candidate_information=candidate_information,
+        company_information=company_information,
+        settings=settings,
+        template_variables=template_variables,
+    )
+    if settings.memory_rss_budget_bytes is None:
+        memory_governor.start()
+        try:
+            produced_files = produce_letters(
+                logger_object=logger_object,
+                memory_governor=memory_governor,
+                **letter_arguments,
+            )
+        finally:
+            memory_governor.stop()
+    else:
+        # A process rarely returns the memory it has freed to the operating system,
+        # so the budget is enforced by replacing the worker process which exceeds it
+        produced_files = produce_letters_in_workers(
             logger_object=logger_object,
+            memory_governor=memory_governor,
+            **letter_arguments,
         )
+    memory_governor.report()
 
-        # getting the candidate information
-        candidate_context = populate_candidate_context(
-            template=document,
-            candidate_dataframe=candidate_information,
-            candidate_index=candidate_index,
-            logger_object=logger_object,
+    if settings.sharded:
+        manifest_path = write_shard_manifest(
+            manifest_directory=settings.shard_manifest_path,
+            shard_index=settings.shard_index,
+            shard_count=settings.shard_count,
+            strategy=settings.shard_strategy,
+            candidate_sheet_path=settings.candidate_sheet_path,
+            candidate_count=len(candidate_information),
+            produced_files=produced_files,
         )
-        # merging both the candidate and company information along with
-        # the rich text objects
-        context = {
-            **candidate_context,
-            **company_context,
-            "todayDate": datetime.date.today().strftime(DEFAULT_DATE_TIME_FORMAT),
-            "webSiteLink": rich_text_web_link,
-            "offerDate": rich_text_date_of_offer,
-        }
-        if __name__ != "__main__":
-            print()
-            print(context)
-        render_and_produce_PDF(
-            template=document,
-            context_information=context,
-            candidate_name=candidate_context["candidateName"] or "CORRUPTED",
-            logger_object=logger_object,
+        logger_object.info(
+            f"Shard {settings.shard_index}/{settings.shard_count} has produced "
+            f"{len(produced_files)} LOIs, see {manifest_path}"
         )
 
-        if candidate_context["candidateName"]:
-            logger_object.info(
-                "LOI for %s has been generated" % candidate_context["candidateName"]
-            )
-
     logger_object.info("LoiProducer has successfully produced all the LOIs")
 
 
 if __name__ == "__main__":
     logger = configure_logger(logger_name=DEFAULT_LOGGER_NAME)
+    argument_parser = argparse.ArgumentParser(description="Produces LOIs in pdf format")
+    add_settings_arguments(argument_parser)
+    argument_parser.add_argument(
+        "--merge-shards",
+        dest="merge_shard_count",
+        type=int,
+        metavar="N",
+        help="check and combine the manifests and archives of the N shards of a batch",
+    )
     try:
-        main(company_name=COMPANY_NAME, logger_object=logger)
+        arguments = argument_parser.parse_args()
+        runtime_settings = settings_from_arguments(arguments)
+        if arguments.merge_shard_count:
+            batch_manifest_path, batch_archive_path = merge_shard_manifests(
+                manifest_directory=runtime_settings.shard_manifest_path,
+                shard_count=arguments.merge_shard_count,
+            )
+            logger.info(
+                f"The shards have been merged into {batch_manifest_path} and {batch_archive_path}"
+            )
+        else:
+            main(
+                company_name=None,
+                logger_object=logger,
+                settings=runtime_settings,
+            )
     except Exception:
         logger.exception("An unexpected error has occurred")
@@ -0,0 +1,204 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from functools import lru_cache
+from typing import IO, Any, Dict, Mapping, Union
+
+import docxtpl
+from docxtpl import DocxTemplate, InlineImage, RichText
+
+# Changing this invalidates every cached render, e.g. when the rendering changes
+RENDER_CACHE_FORMAT_VERSION: str = f"1-docxtpl-{docxtpl.__version__}"
+FILE_DIGEST_CACHE_SIZE: int = 1024
+
+
+@lru_cache(maxsize=FILE_DIGEST_CACHE_SIZE)
+def _get_file_digest(file_path: str, modification_time: int, file_size: int) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file_object:
+        for chunk in iter(lambda: file_object.read(1 << 20), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_file_digest(file: Union[str, os.PathLike, IO[bytes]]) -> str:
+    """
+    This function returns the SHA-256 digest of the content of a file.
+    The digest of a path is only recomputed when the file has changed.
+
+    Args:
+        file (Union[str, os.PathLike, IO[bytes]]): Path to the file or a binary file object
+
+    Returns:
+        str: The hexadecimal digest
+    """
+    if hasattr(file, "read"):
+        position = file.tell()
+        file.seek(0)
+        digest = hashlib.sha256(file.read()).hexdigest()
+        file.seek(position)
+        return digest
+    file_stat = os.stat(file)
+    return _get_file_digest(os.fspath(file), file_stat.st_mtime_ns, file_stat.st_size)
+
+
+def get_canonical_value(value: Any) -> Any:
+    """
+    This function converts a value of a rendering context to a JSON serialisable
+    value which identifies what the value renders to. Images are identified by
+    the content of their file. Unknown objects are identified by their `repr`,
+    which includes their `id` and therefore never produces a false cache hit.
+
+    Args:
+        value (Any): A value of the rendering context
+
+    Returns:
+        Any: The JSON serialisable representation of the value
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, RichText):
+        return {"RichText": value.xml}
+    if isinstance(value, InlineImage):
+        return {
+            "InlineImage": get_file_digest(value.image_descriptor),
+            "width": value.width,
+            "height": value.height,
+            "anchor": getattr(value, "anchor", None),
+        }
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return {"date": value.isoformat()}
+    if isinstance(value, Mapping):
+        return {str(key): get_canonical_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [get_canonical_value(item) for item in value]
+    if hasattr(value, "item"):  # numpy scalars
+        return get_canonical_value(value.item())
+    return {"repr": repr(value)}
+
+
+def get_render_cache_key(context: Dict[str, Any], template: DocxTemplate) -> str:
+    """
+    This function returns the content address of a rendered document, i.e. a hash
+    of the fully merged `context`, of the template file and of the image files
+    referenced by the context
+
+    Args:
+        context (Dict[str, Any]): Dictionary containing information that is to be rendered in the template
+        template (DocxTemplate): The DocxTemplate object which holds template information
+
+    Returns:
+        str: The hexadecimal cache key
+    """
+    key_source = json.dumps(
+        {
+            "version": RENDER_CACHE_FORMAT_VERSION,
+            "template": get_file_digest(template.template_file),
+            "context": get_canonical_value(context),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    Persistent, size-bounded cache of rendered LOIs keyed by content address.
+
+    Every entry holds the files of one rendered LOI (e.g. its `docx` and its `pdf`)
+    stored as `<key>.<extension>` in `cache_path`. When the cache grows beyond
+    `max_bytes`, the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_path: str, max_bytes: int) -> None:
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        # size of the cached file of each extension, least recently used entry first
+        self.entries: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        os.makedirs(cache_path, exist_ok=True)
+        self.load_entries()
+
+    def load_entries(self) -> None:
+        entries: Dict[str, Dict[str, int]] = {}
+        last_used: Dict[str, int] = {}
+        for entry in os.scandir(self.cache_path):
+            key, _, extension = entry.name.partition(".")
+            if entry.is_file() and key and extension:
+                entry_stat = entry.stat()
+                entries.setdefault(key, {})[extension] = entry_stat.st_size
+                last_used[key] = max(last_used.get(key, 0), entry_stat.st_mtime_ns)
+        for key in sorted(entries, key=last_used.__getitem__):
+            self.entries[key] = entries[key]
+            self.size += sum(entries[key].values())
+
+    def get_entry_path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_path, f"{key}.{extension}")
+
+    def restore(self, key: str, destinations: Dict[str, str]) -> bool:
+        """
+        This function copies the cached files of `key` to their destinations
+
+        Args:
+            key (str): The cache key
+            destinations (Dict[str, str]): The destination path of each file extension
+
+        Returns:
+            bool: True on a cache hit, False when any of the files is not cached
+        """
+        entry_paths = {
+            extension: self.get_entry_path(key, extension) for extension in destinations
+        }
+        try:
+            for extension, destination in destinations.items():
+                shutil.copyfile(entry_paths[extension], destination)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        for entry_path in entry_paths.values():
+            os.utime(entry_path)  # recording the use for the LRU eviction
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def store(self, key: str, sources: Dict[str, str]) -> None:
+        """
+        This function copies the rendered files into the cache and evicts the
+        least recently used entries when the cache is over its size
+
+        Args:
+            key (str): The cache key
+            sources (Dict[str, str]): The path of the rendered file of each file extension
+        """
+        self.remove(key)
+        entry: Dict[str, int] = {}
+        for extension, source in sources.items():
+            # copying to a temporary file first, so that readers never see partial files
+            file_descriptor, temporary_path = tempfile.mkstemp(
+                dir=self.cache_path, prefix=".", suffix=".tmp"
+            )
+            os.close(file_descriptor)
+            shutil.copyfile(source, temporary_path)
+            os.replace(temporary_path, self.get_entry_path(key, extension))
+            entry[extension] = os.path.getsize(self.get_entry_path(key, extension))
+        self.entries[key] = entry
+        self.size += sum(entry.values())
+        while self.entries and self.size > self.max_bytes:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key: str) -> None:
+        entry = self.entries.pop(key, {})
+        for extension in entry:
+            try:
+                os.remove(self.get_entry_path(key, extension))
+            except FileNotFoundError:
+                pass  # already evicted by another process sharing the cache
+        self.size -= sum(entry.values())
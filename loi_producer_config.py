@@ -1,4 +1,3 @@
-from locale import LC_ALL
 from logging import DEBUG
 from typing import Optional, List
 from docx.shared import Length, Inches, Cm
@@ -17,13 +16,11 @@ COMPANY_SHEET_PATH: str = "data/CompanyInformation.xlsx"
 CANDIDATE_SHEET_PATH: str = "data/CandidateInformation.xlsx"
 
 
-# Locale Settings
-LOCALE_CATEGORY: int = LC_ALL
-LOCALE_TYPE: str = "en_IN.utf8"
-
 # Log Settings
 DEFAULT_LOGGER_NAME: str = "loi_producer"
-DEFAULT_LOG_MESSAGE_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - function:%(funcName)s - line:%(lineno)d - %(message)s"
+DEFAULT_LOG_MESSAGE_FORMAT: str = (
+    "%(asctime)s - %(name)s - %(levelname)s - function:%(funcName)s - line:%(lineno)d - %(message)s"
+)
 DEFAULT_LOG_LEVEL: int = DEBUG
 DEFAULT_LOG_FILE_MODE: str = "w"
 
@@ -53,6 +50,33 @@ ACCEPTABLE_IMAGE_FORMATS: List[str] = [
     "svg",
 ]
 
+# Render Settings
+# Renders the template once per combination of the values of the variables which
+# change the structure of the document (loops, conditions) and only substitutes
+# the plain text variables for each candidate
+RENDER_BY_EQUIVALENCE_CLASS: bool = True
+# Reads only the columns, and builds only the context entries, which the template references
+PRUNE_CONTEXT: bool = True
+# Directory of the content-addressed cache of rendered LOIs, None disables the cache
+RENDER_CACHE_PATH: Optional[str] = "output/cache/"
+RENDER_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+# Memory Settings
+# A tracemalloc snapshot is taken every MEMORY_SNAPSHOT_INTERVAL letters, 0 disables tracing
+MEMORY_SNAPSHOT_INTERVAL: int = 0
+# The garbage collector is run every MEMORY_GC_INTERVAL letters, 0 disables it
+MEMORY_GC_INTERVAL: int = 100
+# With a budget, e.g. 1024 * 1024 * 1024, the letters are produced in a worker process
+# which is replaced when its RSS exceeds the budget. None produces them in the
+# calling process without a budget
+MEMORY_RSS_BUDGET_BYTES: Optional[int] = None
+MEMORY_REPORT_TOP_ALLOCATIONS: int = 10
+
+# Shard Settings
+# Rows of a sharded batch are assigned by position ("range") or by content ("hash")
+SHARD_STRATEGY: str = "range"
+SHARD_MANIFEST_PATH: str = "output/shards/"
+
 # Date-Time Format Settings
 DEFAULT_DATE_TIME_FORMAT: str = "%d-%b-%Y"
 DEFAULT_OFFER_DATE_MONTH_YEAR_FORMAT: str = " %B, %Y"
@@ -0,0 +1,269 @@
+import contextlib
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional
+
+# Minimum number of letters produced by a worker process before it is replaced, so
+# that a process whose baseline is above the budget is not replaced for every letter
+MIN_LETTERS_BETWEEN_RECYCLES: int = 100
+TRACEMALLOC_FRAMES: int = 1
+TRACEMALLOC_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>")
+
+
+def get_rss_bytes() -> Optional[int]:
+    """
+    This function returns the resident set size of the current process.
+    Where the current RSS is not exposed (e.g. macOS) the peak RSS of the
+    process is returned, which never underestimates the current one.
+
+    Returns:
+        Optional[int]: The RSS in bytes, `None` when it can not be measured on this platform
+    """
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_process_memory_info.argtypes = [
+            wintypes.HANDLE,
+            ctypes.POINTER(ProcessMemoryCounters),
+            wintypes.DWORD,
+        ]
+        if get_process_memory_info(
+            ctypes.windll.kernel32.GetCurrentProcess(),
+            ctypes.byref(counters),
+            counters.cb,
+        ):
+            return counters.WorkingSetSize
+        return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kibibytes on the other unixes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+class MemoryGovernor:
+    """
+    Keeps the memory of a long batch bounded.
+
+    Every `gc_interval` letters the garbage collector is run (0 disables it): the
+    documents of docxtpl are held by reference cycles whose lxml trees live outside
+    of the python heap, so they do not trigger the collector on their own and the
+    RSS grows steadily between automatic collections. Every `snapshot_interval`
+    letters a tracemalloc snapshot is taken (0 disables tracing) and the memory
+    allocated by each stage of the batch is accumulated.
+    When the RSS of the process exceeds `rss_budget_bytes` (None disables the check)
+    `record_letter` asks the caller to stop, so that its worker process is replaced
+    by a fresh one: the memory freed by the collector is rarely returned to the
+    operating system, so only a new process brings the RSS back under the budget.
+    The governor of the parent process merges the summaries of its workers and
+    `report` logs the stages, the recycles and the top allocation sites of the run.
+    """
+
+    def __init__(
+        self,
+        logger_object: logging.Logger,
+        snapshot_interval: int = 0,
+        gc_interval: int = 0,
+        rss_budget_bytes: Optional[int] = None,
+        top_allocations: int = 10,
+    ) -> None:
+        self.logger_object = logger_object
+        self.snapshot_interval = snapshot_interval
+        self.gc_interval = gc_interval
+        self.rss_budget_bytes = rss_budget_bytes
+        self.top_allocations = top_allocations
+        self.letters = 0
+        self.letters_since_recycle = 0
+        self.recycles = 0
+        self.peak_rss_bytes = 0
+        self.stage_allocations: Dict[str, int] = {}
+        self.top_allocation_lines: List[str] = []
+        self.baseline_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.latest_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.started_tracing = False
+
+    @property
+    def tracing(self) -> bool:
+        return self.snapshot_interval > 0 and tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if self.snapshot_interval > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.started_tracing = True
+        if self.tracing:
+            self.baseline_snapshot = self.take_snapshot()
+        if self.rss_budget_bytes is not None and get_rss_bytes() is None:
+            self.logger_object.warning(
+                f"The RSS can not be measured on {sys.platform}, "
+                f"the budget of {self.rss_budget_bytes} bytes is not enforced"
+            )
+
+    def stop(self) -> None:
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(inclusive=False, filename_pattern=ignored_file)
+                for ignored_file in TRACEMALLOC_IGNORED_FILES
+            ]
+        )
+
+    @contextlib.contextmanager
+    def track_stage(self, stage: str) -> Iterator[None]:
+        """
+        This function accumulates the memory which is still allocated
+        at the end of the `stage` while tracing
+
+        Args:
+            stage (str): Name of the stage, e.g. `context` or `render`
+        """
+        if not self.tracing:
+            yield
+            return
+        allocated_before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            self.stage_allocations[stage] = (
+                self.stage_allocations.get(stage, 0)
+                + tracemalloc.get_traced_memory()[0]
+                - allocated_before
+            )
+
+    def record_letter(self) -> bool:
+        """
+        This function records that a letter has been produced
+
+        Returns:
+            bool: True when the RSS is over the budget and the worker should be replaced
+        """
+        self.letters += 1
+        self.letters_since_recycle += 1
+        if self.gc_interval and self.letters % self.gc_interval == 0:
+            gc.collect()
+        if self.tracing and self.letters % self.snapshot_interval == 0:
+            self.latest_snapshot = self.take_snapshot()
+            self.logger_object.debug(
+                f"{tracemalloc.get_traced_memory()[0]} bytes are traced after {self.letters} letters"
+            )
+        rss_bytes = get_rss_bytes()
+        if rss_bytes is None:
+            return False
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss_bytes)
+        return (
+            self.rss_budget_bytes is not None
+            and rss_bytes > self.rss_budget_bytes
+            and self.letters_since_recycle >= MIN_LETTERS_BETWEEN_RECYCLES
+        )
+
+    def record_recycle(self, worker_rss_bytes: Optional[int] = None) -> None:
+        """
+        This function records that a worker process has been replaced
+
+        Args:
+            worker_rss_bytes (Optional[int]): The last RSS of the replaced worker
+        """
+        self.recycles += 1
+        self.letters_since_recycle = 0
+        self.logger_object.info(
+            f"The worker has been replaced after {self.letters} letters, its RSS was "
+            f"{worker_rss_bytes} bytes with a budget of {self.rss_budget_bytes} bytes"
+        )
+
+    def get_summary(self) -> Dict[str, Any]:
+        """
+        This function returns the measurements of the governor of a worker process,
+        to be merged by the governor of the parent process
+
+        Returns:
+            Dict[str, Any]: The picklable summary of the measurements
+        """
+        return {
+            "letters": self.letters,
+            "rss_bytes": get_rss_bytes(),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "stage_allocations": dict(self.stage_allocations),
+            "top_allocations": self.get_top_allocations(),
+        }
+
+    def merge_summary(self, summary: Dict[str, Any]) -> None:
+        """
+        This function adds the measurements of a worker process to this governor
+
+        Args:
+            summary (Dict[str, Any]): The summary returned by `get_summary` in the worker
+        """
+        self.letters += summary["letters"]
+        self.letters_since_recycle += summary["letters"]
+        self.peak_rss_bytes = max(self.peak_rss_bytes, summary["peak_rss_bytes"])
+        for stage, allocated_bytes in summary["stage_allocations"].items():
+            self.stage_allocations[stage] = (
+                self.stage_allocations.get(stage, 0) + allocated_bytes
+            )
+        if summary["top_allocations"]:
+            self.top_allocation_lines = summary["top_allocations"]
+
+    def get_top_allocations(self) -> List[str]:
+        """
+        This function returns the source lines which allocated the most memory,
+        since the start of the run if possible
+
+        Returns:
+            List[str]: The description of the top allocation sites
+        """
+        if self.latest_snapshot is None:
+            return self.top_allocation_lines
+        if self.baseline_snapshot is not None:
+            statistics = self.latest_snapshot.compare_to(
+                self.baseline_snapshot, "lineno"
+            )
+        else:
+            statistics = self.latest_snapshot.statistics("lineno")
+        return [str(statistic) for statistic in statistics[: self.top_allocations]]
+
+    def report(self) -> None:
+        self.logger_object.info(
+            f"Memory: {self.letters} letters, {self.recycles} recycles, "
+            + (
+                f"peak RSS {self.peak_rss_bytes} bytes"
+                if self.peak_rss_bytes
+                else "RSS not measured"
+            )
+        )
+        for stage, allocated_bytes in self.stage_allocations.items():
+            self.logger_object.info(
+                f"Memory: stage {stage} retained {allocated_bytes} bytes"
+            )
+        for top_allocation in self.get_top_allocations():
+            self.logger_object.info(f"Memory: top allocation {top_allocation}")
@@ -0,0 +1,67 @@
+from functools import lru_cache
+from typing import Any
+
+import numpy as np
+
+# Number of formatted values kept in the cache of `format_indian_number`
+NUMBER_FORMAT_CACHE_SIZE: int = 4096
+INDIAN_GROUP_SEPARATOR: str = ","
+
+
+@lru_cache(maxsize=NUMBER_FORMAT_CACHE_SIZE)
+def _format_integer(value: int) -> str:
+    digits = str(abs(value))
+    if len(digits) > 3:
+        head, tail = digits[:-3], digits[-3:]
+        # the digits before the last three are grouped in pairs (lakh, crore, ...)
+        groups = [head[max(end - 2, 0) : end] for end in range(len(head), 0, -2)]
+        digits = INDIAN_GROUP_SEPARATOR.join(groups[::-1] + [tail])
+    return "-" + digits if value < 0 else digits
+
+
+def format_indian_number(value: Any) -> str:
+    """
+    This function formats an integer with the Indian digit grouping (lakh/crore),
+    giving the same output as `locale.format_string("%d", value, grouping=True)`
+    under the `en_IN` locale, without depending on the process-wide locale.
+    Formatted values are cached, as the same amounts repeat across candidates.
+
+    Args:
+        value (Any): An integer, e.g. a python `int` or a `numpy.int64`
+
+    Returns:
+        str: The formatted number
+
+    Example:
+        >>> format_indian_number(800000)
+        '8,00,000'
+        >>> format_indian_number(-123456789)
+        '-12,34,56,789'
+        >>> format_indian_number(999)
+        '999'
+    """
+    return _format_integer(int(value))
+
+
+def format_indian_numbers(values: Any) -> np.ndarray:
+    """
+    This function formats a whole array of integers with the Indian digit grouping.
+    Every distinct value is formatted only once.
+
+    Args:
+        values (Any): An array-like of integers, e.g. a column of a pandas DataFrame
+
+    Returns:
+        np.ndarray: An array of the same shape containing the formatted numbers
+
+    Example:
+        >>> format_indian_numbers([1000, 250000, 1000]).tolist()
+        ['1,000', '2,50,000', '1,000']
+    """
+    values = np.asarray(values, dtype=np.int64)
+    unique_values, inverse = np.unique(values, return_inverse=True)
+    formatted_values = np.array(
+        [format_indian_number(value) for value in unique_values.tolist()],
+        dtype=object,
+    )
+    return formatted_values[inverse].reshape(values.shape)
@@ -0,0 +1,407 @@
+import argparse
+import dataclasses
+import json
+import os
+import re
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple
+
+from docx.shared import Cm, Emu, Inches, Length, Mm, Pt
+
+import loi_producer_config as config
+from loi_producer_shard import SHARD_STRATEGIES, parse_shard
+
+# Prefix of the environment variables which override the settings,
+# e.g. `LOI_PRODUCER_COMPANY_NAME` overrides `company_name`
+ENVIRONMENT_VARIABLE_PREFIX: str = "LOI_PRODUCER_"
+
+LENGTH_UNITS: Dict[str, Any] = {
+    "cm": Cm,
+    "mm": Mm,
+    "in": Inches,
+    "pt": Pt,
+    "emu": Emu,
+}
+
+IMAGE_SIZE_FIELD_SUFFIXES: Tuple[str, ...] = ("_img_height", "_img_width")
+
+
+@dataclasses.dataclass(frozen=True)
+class LoiProducerSettings:
+    """
+    Immutable runtime settings of the LoiProducer. One instance describes one
+    configured batch, so differently configured batches can run side by side in
+    the same process or be shipped to worker processes (the instance only holds
+    strings, integers and tuples, hence it is cheap to pickle).
+
+    The defaults are taken from `loi_producer_config`.
+    """
+
+    company_name: str = config.COMPANY_NAME
+
+    # Path Settings
+    image_path: str = config.IMAGE_PATH
+    output_docx_root_path: str = config.OUTPUT_DOCX_ROOT_PATH
+    output_pdf_root_path: str = config.OUTPUT_PDF_ROOT_PATH
+    docx_template_path: str = config.DOCX_TEMPLATE_PATH
+    company_sheet_path: str = config.COMPANY_SHEET_PATH
+    candidate_sheet_path: str = config.CANDIDATE_SHEET_PATH
+
+    # Number to Word settings
+    num2words_language: str = config.DEFAULT_NUM2WORDS_LANGUAGE
+
+    # Image Settings
+    company_logo_img_height: Optional[Length] = config.COMPANY_LOGO_IMG_HEIGHT
+    company_logo_img_width: Optional[Length] = config.COMPANY_LOGO_IMG_WIDTH
+    hr_signature_img_height: Optional[Length] = config.HR_SIGNATURE_IMG_HEIGHT
+    hr_signature_img_width: Optional[Length] = config.HR_SIGNATURE_IMG_WIDTH
+    candidate_signature_img_height: Optional[Length] = (
+        config.CANDIDATE_SIGNATURE_IMG_HEIGHT
+    )
+    candidate_signature_img_width: Optional[Length] = (
+        config.CANDIDATE_SIGNATURE_IMG_WIDTH
+    )
+
+    # File Format Settings
+    output_file_ending_format: str = config.OUTPUT_FILE_ENDING_FORMAT
+    acceptable_image_formats: Tuple[str, ...] = tuple(config.ACCEPTABLE_IMAGE_FORMATS)
+
+    # Date-Time Format Settings
+    date_time_format: str = config.DEFAULT_DATE_TIME_FORMAT
+    offer_date_month_year_format: str = config.DEFAULT_OFFER_DATE_MONTH_YEAR_FORMAT
+
+    # Render Settings
+    render_by_equivalence_class: bool = config.RENDER_BY_EQUIVALENCE_CLASS
+    prune_context: bool = config.PRUNE_CONTEXT
+    render_cache_path: Optional[str] = config.RENDER_CACHE_PATH
+    render_cache_max_bytes: int = config.RENDER_CACHE_MAX_BYTES
+
+    # Memory Settings
+    memory_snapshot_interval: int = config.MEMORY_SNAPSHOT_INTERVAL
+    memory_gc_interval: int = config.MEMORY_GC_INTERVAL
+    memory_rss_budget_bytes: Optional[int] = config.MEMORY_RSS_BUDGET_BYTES
+    memory_report_top_allocations: int = config.MEMORY_REPORT_TOP_ALLOCATIONS
+
+    # Shard Settings
+    shard_index: Optional[int] = None
+    shard_count: int = 1
+    shard_strategy: str = config.SHARD_STRATEGY
+    shard_manifest_path: str = config.SHARD_MANIFEST_PATH
+
+    @property
+    def sharded(self) -> bool:
+        return self.shard_index is not None
+
+    def __post_init__(self):
+        # `Cm`, `Inches` etc. rescale their argument in `__new__` and therefore do not
+        # survive pickling, so every image size is normalised to `Emu`
+        for field in dataclasses.fields(self):
+            if field.name.endswith(IMAGE_SIZE_FIELD_SUFFIXES):
+                object.__setattr__(
+                    self, field.name, parse_length(getattr(self, field.name))
+                )
+        if self.shard_count < 1:
+            raise ValueError(f"Invalid shard count {self.shard_count}, expected N >= 1")
+        if (
+            self.shard_index is not None
+            and not 0 <= self.shard_index < self.shard_count
+        ):
+            raise ValueError(
+                f"Invalid shard index {self.shard_index}, "
+                f"expected 0 <= i < {self.shard_count}"
+            )
+        if self.shard_strategy not in SHARD_STRATEGIES:
+            raise ValueError(f"Invalid shard strategy: {self.shard_strategy!r}")
+
+    def with_overrides(self, overrides: Mapping[str, Any]) -> "LoiProducerSettings":
+        """
+        This function returns a copy of the settings where the fields named in
+        `overrides` are replaced. Values given as strings (i.e. read from a file,
+        the environment or the command line) are converted to the type of the field.
+
+        Args:
+            overrides (Mapping[str, Any]): Mapping of field names to their new values
+
+        Returns:
+            LoiProducerSettings: The updated copy of the settings
+
+        Raises:
+            ValueError: when a key is not a known setting or a value can not be converted
+        """
+        field_names = {field.name for field in dataclasses.fields(self)}
+        unknown_names = set(overrides) - field_names
+        if unknown_names:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown_names))}")
+        return dataclasses.replace(
+            self,
+            **{
+                name: coerce_setting_value(name=name, value=value)
+                for name, value in overrides.items()
+            },
+        )
+
+
+def parse_length(value: Any) -> Optional[Length]:
+    """
+    This function accepts a length and returns it as a `docx.shared.Length`
+
+    Args:
+        value (Any): A Length, a whole number of EMUs or a string such as `3.15cm` or `0.57in`
+
+    Returns:
+        Optional[Length]: The parsed length as `Emu`, `None` when the value is empty
+
+    Raises:
+        ValueError: when the value is not a valid length
+
+    Example:
+        >>> parse_length("2.54cm") == Inches(1)
+        True
+        >>> parse_length("none") is None
+        True
+    """
+    if value is None:
+        return value
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid length: {value!r}")
+    if isinstance(value, int):
+        return Emu(int(value))
+    if isinstance(value, float) and not value.is_integer():
+        # a unitless fraction is most likely a length in another unit, e.g. 3.15 cm
+        raise ValueError(f"Invalid length: {value!r}, a fraction requires a unit")
+    text = str(value).strip().lower()
+    if text in ("", "none", "null"):
+        return None
+    if isinstance(value, float):
+        text = str(int(value))
+    match = re.fullmatch(r"([0-9]*\.?[0-9]+)\s*([a-z]*)", text)
+    if not match or match.group(2) not in LENGTH_UNITS | {"": Emu}:
+        raise ValueError(f"Invalid length: {value!r}")
+    unit = LENGTH_UNITS.get(match.group(2), Emu)
+    if unit is Emu and "." in match.group(1):
+        raise ValueError(f"Invalid length: {value!r}, a fraction requires a unit")
+    magnitude = float(match.group(1))
+    return Emu(int(unit(int(magnitude) if unit is Emu else magnitude)))
+
+
+def parse_bool(value: Any) -> bool:
+    """
+    This function accepts a flag and returns it as a `bool`
+
+    Args:
+        value (Any): A bool or a string such as `true`, `yes`, `1`, `false`, `no` or `0`
+
+    Returns:
+        bool: The parsed flag
+
+    Raises:
+        ValueError: when the value is not a valid flag
+    """
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("1", "true", "yes", "on"):
+        return True
+    if text in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"Invalid flag: {value!r}")
+
+
+def coerce_setting_value(name: str, value: Any) -> Any:
+    """
+    This function converts the raw value of the setting `name` to the type of the field
+
+    Args:
+        name (str): Name of the field of `LoiProducerSettings`
+        value (Any): The raw value
+
+    Returns:
+        The converted value
+    """
+    if name.endswith(IMAGE_SIZE_FIELD_SUFFIXES):
+        return parse_length(value)
+    if name == "acceptable_image_formats":
+        if isinstance(value, str):
+            value = value.split(",")
+        return tuple(str(image_format).strip().lower() for image_format in value)
+    if name in ("render_by_equivalence_class", "prune_context"):
+        return parse_bool(value)
+    if name in (
+        "render_cache_max_bytes",
+        "memory_snapshot_interval",
+        "memory_gc_interval",
+        "memory_report_top_allocations",
+        "shard_count",
+    ):
+        return int(value)
+    if name == "shard_index":
+        return None if str(value).strip().lower() in ("", "none") else int(value)
+    if name == "memory_rss_budget_bytes":
+        # `none` disables the budget
+        return None if str(value).strip().lower() in ("", "none") else int(value)
+    if name == "render_cache_path" and str(value).strip().lower() in ("", "none"):
+        return None  # disables the render cache
+    return value if value is None else str(value)
+
+
+def read_settings_file(file_path: str) -> Dict[str, Any]:
+    """
+    This function reads the settings from a JSON file whose keys are the field names
+    of `LoiProducerSettings`
+
+    Args:
+        file_path (str): Path to the JSON file
+
+    Returns:
+        Dict[str, Any]: The settings read from the file
+    """
+    with open(file_path, encoding="utf-8") as settings_file:
+        settings = json.load(settings_file)
+    if not isinstance(settings, dict):
+        raise ValueError(f"The settings file {file_path} must contain a JSON object")
+    return settings
+
+
+def read_settings_environment(
+    environment: Optional[Mapping[str, str]] = None,
+    prefix: str = ENVIRONMENT_VARIABLE_PREFIX,
+) -> Dict[str, str]:
+    """
+    This function collects the settings from the environment variables,
+    e.g. `LOI_PRODUCER_COMPANY_NAME` is returned as `company_name`
+
+    Args:
+        environment (Optional[Mapping[str, str]]): The environment, `os.environ` by default
+        prefix (str): Prefix of the environment variables
+
+    Returns:
+        Dict[str, str]: The settings found in the environment
+    """
+    environment = os.environ if environment is None else environment
+    field_names = {field.name for field in dataclasses.fields(LoiProducerSettings)}
+    settings = {}
+    for variable, value in environment.items():
+        if variable.startswith(prefix):
+            name = variable[len(prefix) :].lower()
+            if name in field_names:
+                settings[name] = value
+    return settings
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    This function adds the command line arguments used by `load_settings`
+    to the `parser`
+
+    Args:
+        parser (argparse.ArgumentParser): The parser of the command line
+    """
+    parser.add_argument(
+        "--config",
+        dest="config_file",
+        help="path to a JSON file containing the settings",
+    )
+    parser.add_argument(
+        "--company-name",
+        dest="company_name",
+        help="name of the company for which the LOIs are produced",
+    )
+    parser.add_argument(
+        "--shard",
+        dest="shard",
+        metavar="i/N",
+        help="produce only the shard i (0 <= i < N) of the batch split in N shards",
+    )
+    parser.add_argument(
+        "--set",
+        dest="setting_overrides",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a single setting, e.g. --set output_pdf_root_path=out/pdf/",
+    )
+
+
+def load_settings(
+    config_file: Optional[str] = None,
+    environment: Optional[Mapping[str, str]] = None,
+    overrides: Optional[Mapping[str, Any]] = None,
+    base: Optional[LoiProducerSettings] = None,
+) -> LoiProducerSettings:
+    """
+    This function builds the settings by applying, in increasing precedence,
+    the defaults, the settings file, the environment variables and the `overrides`
+    (typically coming from the command line)
+
+    Args:
+        config_file (Optional[str]): Path to a JSON settings file
+        environment (Optional[Mapping[str, str]]): The environment, `os.environ` by default
+        overrides (Optional[Mapping[str, Any]]): Settings with the highest precedence
+        base (Optional[LoiProducerSettings]): The settings to start from, the defaults if not given
+
+    Returns:
+        LoiProducerSettings: The loaded settings
+    """
+    # the layers are merged before they are applied, so that the settings are only
+    # validated as a whole, e.g. a shard index and a shard count from different layers
+    merged_overrides: Dict[str, Any] = (
+        read_settings_file(config_file) if config_file else {}
+    )
+    merged_overrides.update(read_settings_environment(environment))
+    merged_overrides.update(overrides or {})
+    return (base or LoiProducerSettings()).with_overrides(merged_overrides)
+
+
+def settings_from_arguments(
+    arguments: argparse.Namespace,
+    environment: Optional[Mapping[str, str]] = None,
+) -> LoiProducerSettings:
+    """
+    This function builds the settings from the command line arguments
+    added by `add_settings_arguments`
+
+    Args:
+        arguments (argparse.Namespace): The parsed command line arguments
+        environment (Optional[Mapping[str, str]]): The environment, `os.environ` by default
+
+    Returns:
+        LoiProducerSettings: The loaded settings
+    """
+    overrides: Dict[str, Any] = {}
+    for setting_override in arguments.setting_overrides:
+        name, separator, value = setting_override.partition("=")
+        if not separator:
+            raise ValueError(f"Expected NAME=VALUE, got {setting_override!r}")
+        overrides[name.strip()] = value
+    if arguments.company_name:
+        overrides["company_name"] = arguments.company_name
+    if arguments.shard:
+        overrides["shard_index"], overrides["shard_count"] = parse_shard(
+            arguments.shard
+        )
+    return load_settings(
+        config_file=arguments.config_file,
+        environment=environment,
+        overrides=overrides,
+    )
+
+
+def parse_settings(
+    argv: Optional[Sequence[str]] = None,
+    environment: Optional[Mapping[str, str]] = None,
+) -> LoiProducerSettings:
+    """
+    This function parses the command line `argv` and returns the settings
+
+    Args:
+        argv (Optional[Sequence[str]]): The command line arguments, `sys.argv[1:]` by default
+        environment (Optional[Mapping[str, str]]): The environment, `os.environ` by default
+
+    Returns:
+        LoiProducerSettings: The loaded settings
+    """
+    parser = argparse.ArgumentParser(description="Produces LOIs in pdf format")
+    add_settings_arguments(parser)
+    return settings_from_arguments(parser.parse_args(argv), environment=environment)
+
+
+DEFAULT_SETTINGS: LoiProducerSettings = LoiProducerSettings()
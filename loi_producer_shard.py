@@ -0,0 +1,288 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zipfile
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from loi_producer_cache import get_file_digest
+
+SHARD_STRATEGIES: Tuple[str, ...] = ("range", "hash")
+SHARD_MANIFEST_FORMAT: str = "shard-{shard_index:04d}-of-{shard_count:04d}.json"
+SHARD_ARCHIVE_FORMAT: str = "shard-{shard_index:04d}-of-{shard_count:04d}.zip"
+BATCH_MANIFEST_NAME: str = "batch-manifest.json"
+BATCH_ARCHIVE_NAME: str = "batch.zip"
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """
+    This function parses a shard given as `i/N`, i.e. the shard `i` of `N`
+    shards where `i` is between 0 and N - 1 inclusive
+
+    Args:
+        shard (str): The shard, e.g. `0/4`
+
+    Returns:
+        Tuple[int, int]: The index of the shard and the number of shards
+
+    Raises:
+        ValueError: when the shard is not of the form `i/N` with 0 <= i < N
+
+    Example:
+        >>> parse_shard("2/4")
+        (2, 4)
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", shard)
+    if not match or not int(match.group(1)) < int(match.group(2)):
+        raise ValueError(f"Invalid shard {shard!r}, expected i/N with 0 <= i < N")
+    return int(match.group(1)), int(match.group(2))
+
+
+def get_shard_assignments(
+    candidate_dataframe: pd.DataFrame, shard_count: int, strategy: str
+) -> np.ndarray:
+    """
+    This function deterministically assigns every row of the candidate sheet to a shard.
+    `range` splits the rows in contiguous blocks of (almost) equal size, `hash` assigns
+    every row by a hash of its content, so the assignment of a row does not depend
+    on the rows before it.
+
+    Args:
+        candidate_dataframe (pd.DataFrame): The Pandas DataFrame containing candidate information
+        shard_count (int): The number of shards
+        strategy (str): `range` or `hash`
+
+    Returns:
+        np.ndarray: The index of the shard of each row
+    """
+    if strategy == "range":
+        return (
+            np.arange(len(candidate_dataframe))
+            * shard_count
+            // max(len(candidate_dataframe), 1)
+        )
+    if strategy == "hash":
+        # hash_pandas_object is stable across processes, unlike the builtin hash()
+        row_hashes = pd.util.hash_pandas_object(candidate_dataframe, index=False)
+        return (row_hashes.to_numpy() % np.uint64(shard_count)).astype(np.int64)
+    raise ValueError(
+        f"Unknown shard strategy {strategy!r}, expected one of {SHARD_STRATEGIES}"
+    )
+
+
+def select_shard_rows(
+    candidate_dataframe: pd.DataFrame,
+    shard_index: int,
+    shard_count: int,
+    strategy: str,
+) -> List[int]:
+    """
+    This function returns the row indices of the candidates of a shard
+
+    Args:
+        candidate_dataframe (pd.DataFrame): The Pandas DataFrame containing candidate information
+        shard_index (int): The index of the shard
+        shard_count (int): The number of shards
+        strategy (str): `range` or `hash`
+
+    Returns:
+        List[int]: The row indices of the shard in increasing order
+    """
+    assignments = get_shard_assignments(candidate_dataframe, shard_count, strategy)
+    return np.flatnonzero(assignments == shard_index).tolist()
+
+
+def write_json_atomically(file_path: str, content: Any) -> None:
+    file_descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path) or ".", prefix=".", suffix=".tmp"
+    )
+    with os.fdopen(file_descriptor, "w", encoding="utf-8") as temporary_file:
+        json.dump(content, temporary_file, indent=2)
+    os.replace(temporary_path, file_path)
+
+
+def write_shard_manifest(
+    manifest_directory: str,
+    shard_index: int,
+    shard_count: int,
+    strategy: str,
+    candidate_sheet_path: str,
+    candidate_count: int,
+    produced_files: Dict[int, Dict[str, str]],
+) -> str:
+    """
+    This function archives the LOIs produced by a shard and writes the manifest of the shard
+
+    Args:
+        manifest_directory (str): The directory of the manifests and archives of the shards
+        shard_index (int): The index of the shard
+        shard_count (int): The number of shards
+        strategy (str): `range` or `hash`
+        candidate_sheet_path (str): Path to the candidate sheet of the batch
+        candidate_count (int): The number of candidates in the whole batch
+        produced_files (Dict[int, Dict[str, str]]): The path of each file extension produced for each row
+
+    Returns:
+        str: The path to the manifest
+    """
+    os.makedirs(manifest_directory, exist_ok=True)
+    archive_name = SHARD_ARCHIVE_FORMAT.format(
+        shard_index=shard_index, shard_count=shard_count
+    )
+    rows = []
+    member_rows: Dict[str, int] = {}
+    with zipfile.ZipFile(
+        os.path.join(manifest_directory, archive_name), "w", zipfile.ZIP_DEFLATED
+    ) as archive:
+        for row, file_paths in sorted(produced_files.items()):
+            files = {}
+            for extension, file_path in file_paths.items():
+                member_name = f"{extension}/{os.path.basename(file_path)}"
+                if member_name in member_rows:
+                    raise ValueError(
+                        f"The rows {member_rows[member_name]} and {row} "
+                        f"both produced {member_name}"
+                    )
+                member_rows[member_name] = row
+                archive.write(file_path, arcname=member_name)
+                files[extension] = {
+                    "member": member_name,
+                    "sha256": get_file_digest(file_path),
+                }
+            rows.append({"row": row, "files": files})
+
+    manifest_path = os.path.join(
+        manifest_directory,
+        SHARD_MANIFEST_FORMAT.format(shard_index=shard_index, shard_count=shard_count),
+    )
+    write_json_atomically(
+        manifest_path,
+        {
+            "shard_index": shard_index,
+            "shard_count": shard_count,
+            "strategy": strategy,
+            "batch_digest": get_file_digest(candidate_sheet_path),
+            "candidate_count": candidate_count,
+            "archive": archive_name,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "rows": rows,
+        },
+    )
+    return manifest_path
+
+
+def merge_shard_manifests(manifest_directory: str, shard_count: int) -> Tuple[str, str]:
+    """
+    This function checks that the shards of a batch are complete and consistent,
+    then combines their manifests and archives into a single manifest and archive
+
+    Args:
+        manifest_directory (str): The directory of the manifests and archives of the shards
+        shard_count (int): The number of shards of the batch
+
+    Returns:
+        Tuple[str, str]: The paths to the batch manifest and the batch archive
+
+    Raises:
+        ValueError: when a shard is missing, the shards belong to different batches,
+        the rows of the batch are not all produced exactly once, two rows produced
+        files of the same name or a file of an archive does not match its manifest
+    """
+    manifests = []
+    for shard_index in range(shard_count):
+        manifest_path = os.path.join(
+            manifest_directory,
+            SHARD_MANIFEST_FORMAT.format(
+                shard_index=shard_index, shard_count=shard_count
+            ),
+        )
+        if not os.path.exists(manifest_path):
+            raise ValueError(
+                f"The manifest of shard {shard_index}/{shard_count} is missing"
+            )
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            manifests.append(json.load(manifest_file))
+
+    batch_properties = {
+        (manifest["strategy"], manifest["batch_digest"], manifest["candidate_count"])
+        for manifest in manifests
+    }
+    if len(batch_properties) != 1:
+        raise ValueError(
+            "The shards were produced from different batches or strategies"
+        )
+    strategy, batch_digest, candidate_count = batch_properties.pop()
+
+    produced_rows = [row["row"] for manifest in manifests for row in manifest["rows"]]
+    missing_rows = sorted(set(range(candidate_count)) - set(produced_rows))
+    if missing_rows or len(produced_rows) != candidate_count:
+        raise ValueError(
+            f"The shards are incomplete: rows {missing_rows} are missing and "
+            f"{len(produced_rows)} rows were produced for {candidate_count} candidates"
+        )
+
+    member_rows: Dict[str, int] = {}
+    for manifest in manifests:
+        for row in manifest["rows"]:
+            for file in row["files"].values():
+                if file["member"] in member_rows:
+                    raise ValueError(
+                        f"The rows {member_rows[file['member']]} and {row['row']} "
+                        f"both produced {file['member']}"
+                    )
+                member_rows[file["member"]] = row["row"]
+
+    batch_archive_path = os.path.join(manifest_directory, BATCH_ARCHIVE_NAME)
+    with zipfile.ZipFile(
+        batch_archive_path, "w", zipfile.ZIP_DEFLATED
+    ) as batch_archive:
+        for manifest in manifests:
+            member_digests = {
+                file["member"]: file["sha256"]
+                for row in manifest["rows"]
+                for file in row["files"].values()
+            }
+            with zipfile.ZipFile(
+                os.path.join(manifest_directory, manifest["archive"])
+            ) as shard_archive:
+                for member in shard_archive.infolist():
+                    content = shard_archive.read(member)
+                    if hashlib.sha256(content).hexdigest() != member_digests.pop(
+                        member.filename, None
+                    ):
+                        raise ValueError(
+                            f"{member.filename} of {manifest['archive']} "
+                            "does not match the manifest of its shard"
+                        )
+                    batch_archive.writestr(member, content)
+            if member_digests:
+                raise ValueError(
+                    f"{', '.join(sorted(member_digests))} of the manifest "
+                    f"are missing from {manifest['archive']}"
+                )
+
+    batch_manifest_path = os.path.join(manifest_directory, BATCH_MANIFEST_NAME)
+    write_json_atomically(
+        batch_manifest_path,
+        {
+            "shard_count": shard_count,
+            "strategy": strategy,
+            "batch_digest": batch_digest,
+            "candidate_count": candidate_count,
+            "archive": BATCH_ARCHIVE_NAME,
+            "shards": [
+                {key: manifest[key] for key in ("shard_index", "archive", "created")}
+                for manifest in manifests
+            ],
+            "rows": sorted(
+                (row for manifest in manifests for row in manifest["rows"]),
+                key=lambda row: row["row"],
+            ),
+        },
+    )
+    return batch_manifest_path, batch_archive_path
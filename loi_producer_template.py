@@ -0,0 +1,438 @@
+import dataclasses
+import re
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from docx import Document
+from docxtpl import DocxTemplate, InlineImage
+from jinja2 import Environment, meta, nodes
+
+# Key of the document body among the rendered parts, the headers and
+# footers are keyed by their relationship id
+BODY_PART_KEY: str = "body"
+
+# Number of rendered skeletons (one per equivalence class) kept by a SkeletonRenderer
+DEFAULT_MAX_SKELETONS: int = 64
+
+# Internals of DocxTemplate used by a SkeletonRenderer to replay `DocxTemplate.render`,
+# when one of them is missing the renderer falls back to `DocxTemplate.render`
+SKELETON_RENDERER_REQUIRED_ATTRIBUTES: Tuple[str, ...] = (
+    "render_init",
+    "resolve_listing",
+    "fix_tables",
+    "fix_docpr_ids",
+    "map_tree",
+    "get_headers_footers",
+    "get_headers_footers_encoding",
+    "get_part_xml",
+    "map_headers_footers_xml",
+)
+
+# Values which add relationships to the document part they are rendered in,
+# so their rendered xml can not be reused by another document
+DOCX_BOUND_TYPES: Tuple[type, ...] = (InlineImage,)
+try:
+    from docxtpl import Subdoc
+
+    DOCX_BOUND_TYPES += (Subdoc,)
+except ImportError:  # Subdoc requires docxcompose, an optional dependency of docxtpl
+    pass
+
+# Core properties and footnotes which DocxTemplate renders with the context,
+# see `DocxTemplate.render_properties` and `DocxTemplate.render_footnotes`
+RENDERED_CORE_PROPERTIES: Tuple[str, ...] = (
+    "author",
+    "comments",
+    "identifier",
+    "language",
+    "subject",
+    "title",
+)
+FOOTNOTES_CONTENT_TYPE: str = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.footnotes+xml"
+)
+
+SUBSTITUTION_TOKEN_FORMAT: str = "@@LOI_SUBSTITUTION_{index}@@"
+SUBSTITUTION_TOKEN_PATTERN = re.compile(r"@@LOI_SUBSTITUTION_(\d+)@@")
+
+
+@dataclasses.dataclass(frozen=True)
+class TemplateAnalysis:
+    """
+    The variables referenced by a template, split by how they are used
+
+    `substitution_variables` are only ever printed as they are (`{{ name }}`),
+    so their values are plain text substitutions. Every other variable
+    (loop iterables, conditions, filters, attribute access ...) may change
+    the structure of the document and is part of `structural_variables`.
+    """
+
+    structural_variables: FrozenSet[str]
+    substitution_variables: FrozenSet[str]
+
+    @property
+    def variables(self) -> FrozenSet[str]:
+        return self.structural_variables | self.substitution_variables
+
+
+def get_patched_template_parts(template: DocxTemplate) -> Dict[str, str]:
+    """
+    This function reads the template from its file and returns the jinja source,
+    i.e. the xml patched by docxtpl, of the body and of every header and footer
+
+    Args:
+        template (DocxTemplate): The DocxTemplate object which holds template information
+
+    Returns:
+        Dict[str, str]: The jinja source keyed by `BODY_PART_KEY` or the relationship id
+    """
+    source_document = Document(template.template_file)
+    parts = {
+        BODY_PART_KEY: template.patch_xml(
+            template.xml_to_string(source_document._element.body)
+        )
+    }
+    for uri in (template.HEADER_URI, template.FOOTER_URI):
+        for relationship_key, relationship in source_document._part.rels.items():
+            if relationship.reltype == uri and relationship.target_part.blob:
+                parts[relationship_key] = template.patch_xml(
+                    template.get_part_xml(relationship.target_part)
+                )
+    return parts
+
+
+def get_rendered_metadata_sources(template: DocxTemplate) -> Dict[str, str]:
+    """
+    This function returns the jinja source of the core properties and footnotes
+    of the template, for the versions of docxtpl which render them with the context
+
+    Args:
+        template (DocxTemplate): The DocxTemplate object which holds template information
+
+    Returns:
+        Dict[str, str]: The jinja source keyed by the name of the property or footnotes part
+    """
+    source_document = Document(template.template_file)
+    sources = {}
+    # looking up the class, as DocxTemplate forwards unknown attributes to its document
+    if hasattr(type(template), "render_properties"):
+        for name in RENDERED_CORE_PROPERTIES:
+            sources[name] = getattr(source_document.core_properties, name) or ""
+    if hasattr(type(template), "render_footnotes"):
+        for part in source_document.part.package.parts:
+            if part.content_type == FOOTNOTES_CONTENT_TYPE:
+                sources[str(part.partname)] = template.patch_xml(
+                    part.blob.decode("utf-8")
+                    if isinstance(part.blob, bytes)
+                    else part.blob
+                )
+    return sources
+
+
+def analyse_template_source(
+    source: str, jinja_env: Optional[Environment] = None
+) -> TemplateAnalysis:
+    """
+    This function finds the variables referenced by the jinja `source` and
+    classifies them as structural or substitution variables
+
+    Args:
+        source (str): The jinja source
+        jinja_env (Optional[Environment]): The jinja environment used to parse the source
+
+    Returns:
+        TemplateAnalysis: The classified variables
+
+    Example:
+        >>> analysis = analyse_template_source(
+        ...     "{% if hra %}{{ hra }}{% endif %}{{ candidateName }}{{ basic|upper }}"
+        ... )
+        >>> sorted(analysis.structural_variables)
+        ['basic', 'hra']
+        >>> sorted(analysis.substitution_variables)
+        ['candidateName']
+    """
+    template_ast = (jinja_env or Environment()).parse(source)
+    variables = meta.find_undeclared_variables(template_ast)
+    printed_name_ids = {
+        id(expression)
+        for output in template_ast.find_all(nodes.Output)
+        for expression in output.nodes
+        if isinstance(expression, nodes.Name)
+    }
+    structural_variables = {
+        name.name
+        for name in template_ast.find_all(nodes.Name)
+        if name.name in variables and id(name) not in printed_name_ids
+    }
+    return TemplateAnalysis(
+        structural_variables=frozenset(structural_variables),
+        substitution_variables=frozenset(variables - structural_variables),
+    )
+
+
+def analyse_template(
+    template: DocxTemplate, jinja_env: Optional[Environment] = None
+) -> TemplateAnalysis:
+    """
+    This function analyses every part of the `template` which is rendered with
+    the context, i.e. the body, the headers and footers and, depending on the
+    version of docxtpl, the core properties and the footnotes
+
+    Args:
+        template (DocxTemplate): The DocxTemplate object which holds template information
+        jinja_env (Optional[Environment]): The jinja environment used to parse the template
+
+    Returns:
+        TemplateAnalysis: The classified variables of the whole template
+    """
+    analyses = [
+        analyse_template_source(
+            "".join(get_patched_template_parts(template).values()), jinja_env
+        )
+    ] + [
+        analyse_template_source(source, jinja_env)
+        for source in get_rendered_metadata_sources(template).values()
+    ]
+    structural_variables = frozenset().union(
+        *(analysis.structural_variables for analysis in analyses)
+    )
+    return TemplateAnalysis(
+        structural_variables=structural_variables,
+        substitution_variables=frozenset().union(
+            *(analysis.substitution_variables for analysis in analyses)
+        )
+        - structural_variables,
+    )
+
+
+def get_hashable_value(value: Any) -> Hashable:
+    """
+    This function returns a hashable stand-in of `value` used to compare
+    the values of the structural variables of two contexts. Values which are
+    equal but render differently (e.g. `1`, `1.0` and `True`) get different
+    stand-ins, as the type is part of it.
+
+    Args:
+        value (Any): A value of the context
+
+    Returns:
+        Hashable: The type of the value with the value itself if it is a plain
+        scalar, with its representation otherwise
+
+    Example:
+        >>> get_hashable_value(1) == get_hashable_value(1.0)
+        False
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return type(value), value
+    # the representation tells apart the items of containers, e.g. (1,) and (1.0,)
+    return type(value), repr(value)
+
+
+def supports_skeleton_rendering(template: DocxTemplate) -> bool:
+    """
+    This function checks that the installed docxtpl provides the internals
+    of `DocxTemplate` used by a SkeletonRenderer
+
+    Args:
+        template (DocxTemplate): The DocxTemplate object which holds template information
+
+    Returns:
+        bool: True when the template can be rendered by equivalence class
+    """
+    # looking up the class, as DocxTemplate forwards unknown attributes to its document
+    return all(
+        hasattr(type(template), name) for name in SKELETON_RENDERER_REQUIRED_ATTRIBUTES
+    )
+
+
+def is_docx_bound(value: Any) -> bool:
+    """
+    This function checks whether `value` holds an object (e.g. an InlineImage)
+    whose rendering depends on the document it is rendered in
+
+    Args:
+        value (Any): A value of the context
+
+    Returns:
+        bool: True when the value or one of its items is bound to a document
+    """
+    if isinstance(value, DOCX_BOUND_TYPES):
+        return True
+    if isinstance(value, dict):
+        return any(is_docx_bound(item) for item in value.values())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return any(is_docx_bound(item) for item in value)
+    return False
+
+
+class SkeletonRenderer:
+    """
+    Renders a DocxTemplate by equivalence class of contexts.
+
+    Two contexts are equivalent when they agree on every structural variable
+    of the template. For each class the jinja template is rendered once, with
+    the substitution variables replaced by tokens; rendering a context then
+    only replaces the tokens by the values of that context. The output is the
+    same as `DocxTemplate.render` without autoescaping.
+
+    A context whose structural variables hold a docx-bound value (e.g. an
+    InlineImage in a condition), or a docxtpl without the internals used here,
+    is rendered with `DocxTemplate.render` instead.
+    """
+
+    def __init__(
+        self,
+        template: DocxTemplate,
+        jinja_env: Optional[Environment] = None,
+        max_skeletons: int = DEFAULT_MAX_SKELETONS,
+    ) -> None:
+        self.template = template
+        self.jinja_env = jinja_env or Environment()
+        self.max_skeletons = max_skeletons
+        self.supported = supports_skeleton_rendering(template)
+        self.sources = get_patched_template_parts(template)
+        self.analysis = analyse_template_source(
+            "".join(self.sources.values()), self.jinja_env
+        )
+        self.substitution_variables: Tuple[str, ...] = tuple(
+            sorted(self.analysis.substitution_variables)
+        )
+        # the jinja templates are compiled once instead of once per render
+        self.compiled_sources = (
+            {
+                part_key: self.jinja_env.from_string(
+                    re.sub(r"<w:p([ >])", r"\n<w:p\1", source)
+                )
+                for part_key, source in self.sources.items()
+            }
+            if self.supported
+            else {}
+        )
+        self.skeletons: "OrderedDict[Hashable, Dict[str, List[Any]]]" = OrderedDict()
+        self.skeleton_renders = 0
+        self.substitution_renders = 0
+        self.fallback_renders = 0
+
+    def get_equivalence_class(self, context: Dict[str, Any]) -> Hashable:
+        return tuple(
+            (name, get_hashable_value(context.get(name)))
+            for name in sorted(self.analysis.structural_variables)
+        )
+
+    def is_renderable_by_skeleton(self, context: Dict[str, Any]) -> bool:
+        return self.supported and not any(
+            is_docx_bound(context.get(name))
+            for name in self.analysis.structural_variables
+        )
+
+    def render_skeleton(
+        self, context: Dict[str, Any], parts: Dict[str, Any]
+    ) -> Dict[str, List[Any]]:
+        """
+        This function renders the jinja source of every part with the substitution
+        variables replaced by tokens and splits the result into literal xml and
+        the indices of the substitution variables. `parts` holds the document part
+        of each part key, as set by `DocxTemplate.render_xml_part`.
+        """
+        skeleton_context = dict(context) | {
+            name: SUBSTITUTION_TOKEN_FORMAT.format(index=index)
+            for index, name in enumerate(self.substitution_variables)
+        }
+        skeleton = {}
+        for part_key, compiled_source in self.compiled_sources.items():
+            self.template.current_rendering_part = parts.get(part_key)
+            rendered_xml = compiled_source.render(skeleton_context)
+            # odd positions hold the indices of the substitution variables
+            skeleton[part_key] = [
+                int(segment) if position % 2 else segment
+                for position, segment in enumerate(
+                    SUBSTITUTION_TOKEN_PATTERN.split(rendered_xml)
+                )
+            ]
+        self.skeleton_renders += 1
+        return skeleton
+
+    def get_skeleton(
+        self, context: Dict[str, Any], parts: Dict[str, Any]
+    ) -> Dict[str, List[Any]]:
+        equivalence_class = self.get_equivalence_class(context)
+        if equivalence_class in self.skeletons:
+            self.skeletons.move_to_end(equivalence_class)
+        else:
+            self.skeletons[equivalence_class] = self.render_skeleton(context, parts)
+            if len(self.skeletons) > self.max_skeletons:
+                self.skeletons.popitem(last=False)
+        return self.skeletons[equivalence_class]
+
+    def substitute(self, segments: List[Any], context: Dict[str, Any], part) -> str:
+        """
+        This function joins the `segments` of a skeleton part with the values of
+        the `context` and applies the post-processing of `DocxTemplate.render_xml_part`
+        """
+        # InlineImage objects add their picture to the part being rendered
+        self.template.current_rendering_part = part
+        xml = "".join(
+            (
+                str(context.get(self.substitution_variables[segment], ""))
+                if position % 2
+                else segment
+            )
+            for position, segment in enumerate(segments)
+        )
+        xml = re.sub(r"\n<w:p([ >])", r"<w:p\1", xml)
+        xml = (
+            xml.replace("{_{", "{{")
+            .replace("}_}", "}}")
+            .replace("{_%", "{%")
+            .replace("%_}", "%}")
+        )
+        return self.template.resolve_listing(xml)
+
+    def render(self, context: Dict[str, Any]) -> None:
+        """
+        This function renders the `context` in the template,
+        the equivalent of `DocxTemplate.render(context)`
+
+        Args:
+            context (Dict[str, Any]): Dictionary containing information that is to be rendered in the template
+        """
+        template = self.template
+        if not self.is_renderable_by_skeleton(context):
+            template.render(context, self.jinja_env)
+            self.fallback_renders += 1
+            return
+
+        template.render_init()
+        parts = {BODY_PART_KEY: template.docx._part} | {
+            relationship_key: part
+            for uri in (template.HEADER_URI, template.FOOTER_URI)
+            for relationship_key, part in template.get_headers_footers(uri)
+        }
+        skeleton = self.get_skeleton(context, parts)
+
+        tree = template.fix_tables(
+            self.substitute(skeleton[BODY_PART_KEY], context, template.docx._part)
+        )
+        template.fix_docpr_ids(tree)
+        template.map_tree(tree)
+
+        for uri in (template.HEADER_URI, template.FOOTER_URI):
+            for relationship_key, part in list(template.get_headers_footers(uri)):
+                xml = self.substitute(skeleton[relationship_key], context, part)
+                template.map_headers_footers_xml(
+                    relationship_key,
+                    xml.encode(
+                        template.get_headers_footers_encoding(
+                            template.get_part_xml(part)
+                        )
+                    ),
+                )
+
+        if hasattr(template, "render_properties"):
+            template.render_properties(context, self.jinja_env)
+        if hasattr(template, "render_footnotes"):
+            template.render_footnotes(context, self.jinja_env)
+        template.is_rendered = True
+        self.substitution_renders += 1
@@ -1,10 +1,13 @@
 # from ..LoiProducer import *
 import logging
 import pytest
+from docx import Document
 from docxtpl import RichText
 import pandas as pd
 
 import loi_producer
+from loi_producer_cache import RenderCache
+from loi_producer_settings import LoiProducerSettings
 
 
 @pytest.mark.parametrize("a,b", [(10, 12), (15, 17)])
@@ -81,7 +84,7 @@ def test_populate_candidate_context(document_template, candidate_information):
     assert context["candidateName"] == "Subhankar Karmakar"
     assert context["location"] == "Jaipur"
     assert context["designation"] == "Associate"
-    assert context["basic"] == "800000"
+    assert context["basic"] == "8,00,000"
     assert context["hra"] == "0"
     corrupted_candidate_information = candidate_information.rename(
         columns={"candidateSignature": "candidateSignatures"}
@@ -95,9 +98,19 @@ def test_populate_candidate_context(document_template, candidate_information):
     assert corrupted_context["candidateName"] == ""
 
 
-# def test_get_automapped_numeric_and_string_context():
-#     assert True
-#
+def test_get_automapped_numeric_and_string_context(candidate_information):
+    formatted_numeric_columns = loi_producer.get_formatted_numeric_columns(
+        candidate_information
+    )
+    assert formatted_numeric_columns.loc[0, "basic"] == "8,00,000"
+    for candidate_index in range(len(candidate_information)):
+        assert loi_producer.get_automapped_numeric_and_string_context(
+            dataframe=candidate_information,
+            row_identifier=candidate_index,
+            formatted_numeric_columns=formatted_numeric_columns,
+        ) == loi_producer.get_automapped_numeric_and_string_context(
+            dataframe=candidate_information, row_identifier=candidate_index
+        )
 
 
 def test_configure_rich_text_web_link(fake_document_template, fake_company_context):
@@ -128,11 +141,11 @@ def test_configure_rich_text_date_of_offer(
 def test_render_and_produce_PDF(
     fake_document_template, fake_company_context, fake_candidate_context, mocker
 ):
-    mocker.patch(
-        "loi_producer.OUTPUT_DOCX_ROOT_PATH", "tests/test_output/test_document/"
+    settings = LoiProducerSettings(
+        output_docx_root_path="tests/test_output/test_document/",
+        output_pdf_root_path="tests/test_output/test_pdf/",
+        output_file_ending_format="_test_",
     )
-    mocker.patch("loi_producer.OUTPUT_PDF_ROOT_PATH", "tests/test_output/test_pdf/")
-    mocker.patch("loi_producer.OUTPUT_FILE_ENDING_FORMAT", "_test_")
     # mocker.patch("loi_producer.DOCX_TEMPLATE_PATH", "tests/tes_templates/test_loi_template.docx")
     # mocker.patch("conftest.loi_producer_config.DOCX_TEMPLATE_PATH", "tests/test_templates/test_loi_template.docx")
 
@@ -149,19 +162,22 @@ def test_render_and_produce_PDF(
         context_information=context,
         candidate_name=fake_candidate_context["candidateName"] or "CORRUPTED",
         logger_object=logger,
+        settings=settings,
     )
 
 
 def test_main(
     fake_document_template, fake_company_context, fake_candidate_context_list, mocker
 ):
-    mocker.patch(
-        "loi_producer.DOCX_TEMPLATE_PATH", "tests/test_templates/test_loi_template.docx"
+    settings = LoiProducerSettings(
+        docx_template_path="tests/test_templates/test_loi_template.docx",
+        output_file_ending_format="_test_main",
+        render_cache_path=None,
+        memory_rss_budget_bytes=None,
     )
-    mocker.patch("loi_producer.OUTPUT_FILE_ENDING_FORMAT", "_test_main")
     mocker.patch(
         "loi_producer.pd.read_excel",
-        side_effect=[fake_candidate_context_list, fake_company_context],
+        side_effect=[pd.DataFrame(fake_candidate_context_list), fake_company_context],
     )
     mocker.patch(
         "loi_producer.populate_company_context", return_value=fake_company_context
@@ -182,4 +198,194 @@ def test_main(
     mocker.patch("loi_producer.render_and_produce_PDF", return_value=None)
 
     logger = loi_producer.configure_logger(logger_name="TestLogger", file_mode="w")
-    loi_producer.main(company_name="TestCompany", logger_object=logger)
+    loi_producer.main(
+        company_name="TestCompany", logger_object=logger, settings=settings
+    )
+
+
+@pytest.mark.parametrize(
+    "company_name,expected_company_name",
+    [(None, "SettingsCompany"), ("TestCompany", "TestCompany")],
+)
+def test_main_company_name(
+    fake_company_context,
+    fake_candidate_context_list,
+    mocker,
+    company_name,
+    expected_company_name,
+):
+    settings = LoiProducerSettings(
+        docx_template_path="tests/test_templates/test_loi_template.docx",
+        company_name="SettingsCompany",
+        render_cache_path=None,
+        memory_rss_budget_bytes=None,
+    )
+    mocker.patch(
+        "loi_producer.pd.read_excel",
+        side_effect=[pd.DataFrame(fake_candidate_context_list), fake_company_context],
+    )
+    populate_company_context = mocker.patch(
+        "loi_producer.populate_company_context", return_value=fake_company_context
+    )
+    mocker.patch(
+        "loi_producer.populate_candidate_context",
+        side_effect=fake_candidate_context_list,
+    )
+    mocker.patch("loi_producer.configure_rich_text_web_link", return_value="")
+    mocker.patch("loi_producer.configure_rich_text_date_of_offer", return_value="")
+    mocker.patch("loi_producer.render_and_produce_PDF", return_value=None)
+
+    loi_producer.main(
+        company_name=company_name,
+        logger_object=logging.getLogger("TestMainCompanyName"),
+        settings=settings,
+    )
+
+    assert (
+        populate_company_context.call_args.kwargs["company_name"]
+        == expected_company_name
+    )
+    assert (
+        populate_company_context.call_args.kwargs["settings"].company_name
+        == expected_company_name
+    )
+
+
+def test_render_and_produce_PDF_from_render_cache(
+    fake_document_template,
+    fake_company_context,
+    fake_candidate_context,
+    mocker,
+    tmp_path,
+):
+    def fake_convert(input_path, output_path):
+        with open(output_path, "wb") as pdf_file:
+            pdf_file.write(b"%PDF-fake")
+
+    convert = mocker.patch("loi_producer.docx2pdf.convert", side_effect=fake_convert)
+    (tmp_path / "document").mkdir()
+    (tmp_path / "pdf").mkdir()
+    settings = LoiProducerSettings(
+        output_docx_root_path=f"{tmp_path}/document/",
+        output_pdf_root_path=f"{tmp_path}/pdf/",
+        output_file_ending_format="_test_",
+    )
+    render_cache = RenderCache(
+        cache_path=str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024
+    )
+    context = {**fake_candidate_context, **fake_company_context}
+    logger = loi_producer.configure_logger(logger_name="TestLogger", file_mode="w")
+    for _ in range(2):
+        loi_producer.render_and_produce_PDF(
+            template=fake_document_template,
+            context_information=context,
+            candidate_name=fake_candidate_context["candidateName"],
+            logger_object=logger,
+            settings=settings,
+            render_cache=render_cache,
+        )
+
+    assert convert.call_count == 1
+    assert (render_cache.hits, render_cache.misses) == (1, 1)
+    assert (tmp_path / "pdf" / "Test_Candidate_Name_test_.pdf").read_bytes() == (
+        b"%PDF-fake"
+    )
+
+
+def test_main_with_template_without_variables(mocker, tmp_path):
+    document = Document()
+    document.add_paragraph("A letter without variables")
+    template_path = str(tmp_path / "static_template.docx")
+    document.save(template_path)
+    settings = LoiProducerSettings(
+        docx_template_path=template_path,
+        render_cache_path=None,
+        memory_rss_budget_bytes=None,
+    )
+    render_and_produce_PDF = mocker.patch(
+        "loi_producer.render_and_produce_PDF", return_value={}
+    )
+
+    loi_producer.main(
+        company_name=None,
+        logger_object=logging.getLogger("TestStaticTemplate"),
+        settings=settings,
+    )
+
+    assert render_and_produce_PDF.call_count == len(
+        pd.read_excel(settings.candidate_sheet_path)
+    )
+
+
+def test_read_sheet_reads_only_required_columns():
+    required_columns = loi_producer.get_required_columns(
+        {"hra", "ctcInWord"}, loi_producer.CANDIDATE_DERIVED_COLUMNS, "candidateName"
+    )
+    candidate_information, candidate_columns = loi_producer.read_sheet(
+        "data/CandidateInformation.xlsx", required_columns=required_columns
+    )
+    assert list(candidate_information.columns) == [
+        "candidateName",
+        "hra",
+        "totalCtcPerYear",
+    ]
+    assert {"designation", "candidateSignature", "offerDate"} <= set(candidate_columns)
+
+
+def test_populate_candidate_context_with_template_variables(document_template):
+    logger = loi_producer.configure_logger(logger_name="TestLogger", file_mode="w")
+    candidate_information, _ = loi_producer.read_sheet(
+        "data/CandidateInformation.xlsx",
+        required_columns={"candidateName", "location", "totalCtcPerYear"},
+    )
+    context = loi_producer.populate_candidate_context(
+        template=document_template,
+        candidate_dataframe=candidate_information,
+        candidate_index=0,
+        logger_object=logger,
+        template_variables={"candidateName", "location", "ctcInWord"},
+    )
+    assert context["candidateName"] == "Subhankar Karmakar"
+    assert context["location"] == "Jaipur"
+    assert "ctcInWord" in context
+    assert "candidateSignature" not in context
+
+
+def test_preflight_template():
+    logger = loi_producer.configure_logger(logger_name="TestLogger", file_mode="w")
+    undefined_variables, unused_columns = loi_producer.preflight_template(
+        template_variables={
+            "candidateName",
+            "ctcInWord",
+            "companyLogo",
+            "joiningBonus",
+        },
+        candidate_columns=["candidateName", "totalCtcPerYear", "designation"],
+        company_columns=["companyName", "companyLogo", "country"],
+        logger_object=logger,
+    )
+    assert undefined_variables == {"joiningBonus"}
+    assert unused_columns == {
+        "CandidateInformation": {"designation"},
+        "CompanyInformation": {"country"},
+    }
+
+
+def test_preflight_template_missing_derived_columns(caplog):
+    logger = logging.getLogger("TestPreflight")
+    with caplog.at_level(logging.WARNING, logger="TestPreflight"):
+        undefined_variables, _ = loi_producer.preflight_template(
+            template_variables={"candidateName", "ctcInWord", "webSiteLink"},
+            candidate_columns=["candidateName", "designation"],
+            company_columns=["companyName", "webSiteAlias", "webSiteLink"],
+            logger_object=logger,
+        )
+    assert undefined_variables == {"ctcInWord"}
+    assert "ctcInWord (missing columns: totalCtcPerYear)" in caplog.text
+    undefined_variables, _ = loi_producer.preflight_template(
+        template_variables={"webSiteLink"},
+        candidate_columns=["candidateName"],
+        company_columns=["companyName", "webSiteLink"],
+        logger_object=logger,
+    )
+    assert undefined_variables == {"webSiteLink"}
@@ -0,0 +1,85 @@
+from docx.shared import Inches
+from docxtpl import InlineImage, RichText
+
+from loi_producer_cache import RenderCache, get_file_digest, get_render_cache_key
+
+
+def write_entry(directory, name: str, size: int) -> str:
+    file_path = directory / name
+    file_path.write_bytes(b"x" * size)
+    return str(file_path)
+
+
+def test_get_file_digest(tmp_path):
+    first_path = write_entry(tmp_path, "first.bin", 10)
+    second_path = write_entry(tmp_path, "second.bin", 10)
+    assert get_file_digest(first_path) == get_file_digest(second_path)
+    with open(first_path, "rb") as first_file:
+        assert get_file_digest(first_file) == get_file_digest(first_path)
+
+
+def test_get_render_cache_key(fake_document_template, fake_candidate_context):
+    def build_context(today_date: str, image_path: str) -> dict:
+        return fake_candidate_context | {
+            "todayDate": today_date,
+            "webSiteLink": RichText("Test Company Website", bold=True),
+            "companyLogo": InlineImage(
+                tpl=fake_document_template,
+                image_descriptor=image_path,
+                height=Inches(1),
+            ),
+        }
+
+    key = get_render_cache_key(
+        build_context("01-Sep-2022", "images/logo.png"), fake_document_template
+    )
+    assert key == get_render_cache_key(
+        build_context("01-Sep-2022", "images/logo.png"), fake_document_template
+    )
+    assert key != get_render_cache_key(
+        build_context("02-Sep-2022", "images/logo.png"), fake_document_template
+    )
+    assert key != get_render_cache_key(
+        build_context("01-Sep-2022", "images/tcslogo.png"), fake_document_template
+    )
+
+
+def test_render_cache_restore_and_store(tmp_path):
+    render_cache = RenderCache(cache_path=str(tmp_path / "cache"), max_bytes=1000)
+    destinations = {"pdf": str(tmp_path / "restored.pdf")}
+    assert not render_cache.restore("key", destinations)
+
+    render_cache.store("key", {"pdf": write_entry(tmp_path, "rendered.pdf", 100)})
+    assert render_cache.restore("key", destinations)
+    assert (tmp_path / "restored.pdf").read_bytes() == b"x" * 100
+    assert (render_cache.hits, render_cache.misses) == (1, 1)
+
+    reloaded_render_cache = RenderCache(
+        cache_path=str(tmp_path / "cache"), max_bytes=1000
+    )
+    assert reloaded_render_cache.size == 100
+    assert reloaded_render_cache.restore("key", destinations)
+
+
+def test_render_cache_evicts_least_recently_used(tmp_path):
+    render_cache = RenderCache(cache_path=str(tmp_path / "cache"), max_bytes=250)
+    for key in ("first", "second"):
+        render_cache.store(
+            key,
+            {
+                "docx": write_entry(tmp_path, f"{key}.docx", 50),
+                "pdf": write_entry(tmp_path, f"{key}.pdf", 50),
+            },
+        )
+    render_cache.restore("first", {"pdf": str(tmp_path / "restored.pdf")})
+    render_cache.store(
+        "third",
+        {
+            "docx": write_entry(tmp_path, "third.docx", 50),
+            "pdf": write_entry(tmp_path, "third.pdf", 50),
+        },
+    )
+
+    assert list(render_cache.entries) == ["first", "third"]
+    assert render_cache.size == 200
+    assert not (tmp_path / "cache" / "second.pdf").exists()
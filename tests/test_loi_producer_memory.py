@@ -0,0 +1,189 @@
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+from docx import Document
+from docx.shared import Inches
+from docxtpl import DocxTemplate, InlineImage
+
+import loi_producer
+import loi_producer_memory
+from loi_producer_settings import LoiProducerSettings
+from loi_producer_template import SkeletonRenderer
+
+# Number of synthetic letters of the soak test, which only runs when it is set,
+# e.g. LOI_PRODUCER_SOAK_LETTERS=50000 python -m pytest tests/test_loi_producer_memory.py
+SOAK_LETTERS = int(os.environ.get("LOI_PRODUCER_SOAK_LETTERS", "0"))
+SOAK_RSS_GROWTH_LIMIT_BYTES = 64 * 1024 * 1024
+
+
+@pytest.fixture()
+def logger():
+    return logging.getLogger("TestMemoryGovernor")
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="reads the RSS from /proc"
+)
+def test_get_rss_bytes():
+    assert loi_producer_memory.get_rss_bytes() > 0
+
+
+def test_memory_governor_reports_allocations(logger, caplog):
+    memory_governor = loi_producer_memory.MemoryGovernor(
+        logger_object=logger, snapshot_interval=2
+    )
+    memory_governor.start()
+    retained = []
+    try:
+        for _ in range(4):
+            with memory_governor.track_stage("context"):
+                retained.append(bytearray(100_000))
+            assert not memory_governor.record_letter()
+    finally:
+        memory_governor.stop()
+
+    assert memory_governor.letters == 4
+    assert memory_governor.stage_allocations["context"] >= 400_000
+    assert memory_governor.get_top_allocations()
+    with caplog.at_level(logging.INFO, logger="TestMemoryGovernor"):
+        memory_governor.report()
+    assert "top allocation" in caplog.text
+
+
+def test_memory_governor_recycles_over_budget(logger, mocker):
+    mocker.patch("loi_producer_memory.get_rss_bytes", return_value=2000)
+    mocker.patch("loi_producer_memory.MIN_LETTERS_BETWEEN_RECYCLES", 2)
+    memory_governor = loi_producer_memory.MemoryGovernor(
+        logger_object=logger, rss_budget_bytes=1000
+    )
+    assert not memory_governor.record_letter()
+    assert memory_governor.record_letter()
+    memory_governor.record_recycle()
+    assert not memory_governor.record_letter()
+    assert memory_governor.recycles == 1
+    assert memory_governor.peak_rss_bytes == 2000
+
+
+def test_memory_governor_merges_worker_summaries(logger, mocker):
+    mocker.patch("loi_producer_memory.get_rss_bytes", return_value=2000)
+    worker_governor = loi_producer_memory.MemoryGovernor(logger_object=logger)
+    worker_governor.record_letter()
+    worker_governor.stage_allocations["render"] = 100
+    parent_governor = loi_producer_memory.MemoryGovernor(logger_object=logger)
+    parent_governor.merge_summary(worker_governor.get_summary())
+    parent_governor.merge_summary(worker_governor.get_summary())
+
+    assert parent_governor.letters == 2
+    assert parent_governor.peak_rss_bytes == 2000
+    assert parent_governor.stage_allocations == {"render": 200}
+
+
+def test_memory_governor_warns_when_rss_is_not_measured(logger, mocker, caplog):
+    mocker.patch("loi_producer_memory.get_rss_bytes", return_value=None)
+    memory_governor = loi_producer_memory.MemoryGovernor(
+        logger_object=logger, rss_budget_bytes=1000
+    )
+    with caplog.at_level(logging.WARNING, logger="TestMemoryGovernor"):
+        memory_governor.start()
+    assert not memory_governor.record_letter()
+    assert "is not enforced" in caplog.text
+    with caplog.at_level(logging.INFO, logger="TestMemoryGovernor"):
+        memory_governor.report()
+    assert "RSS not measured" in caplog.text
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="the mocks are only inherited by forked workers",
+)
+def test_main_replaces_workers_over_budget(
+    candidate_information, company_information, company_name, mocker, tmp_path, caplog
+):
+    candidate_count = 6
+    candidate_information = pd.concat(
+        [candidate_information] * (candidate_count // len(candidate_information)),
+        ignore_index=True,
+    )
+    candidate_information["candidateName"] = [
+        f"Candidate {candidate_number}" for candidate_number in range(candidate_count)
+    ]
+    settings = LoiProducerSettings(
+        company_name=company_name,
+        docx_template_path="tests/test_templates/test_loi_template.docx",
+        output_docx_root_path=f"{tmp_path}/",
+        output_pdf_root_path=f"{tmp_path}/",
+        render_cache_path=None,
+        memory_rss_budget_bytes=1,
+    )
+    mocker.patch("loi_producer.WORKER_START_METHOD", "fork")
+    mocker.patch("loi_producer_memory.MIN_LETTERS_BETWEEN_RECYCLES", 2)
+    mocker.patch(
+        "loi_producer.pd.read_excel",
+        side_effect=[candidate_information, company_information],
+    )
+    mocker.patch(
+        "loi_producer.docx2pdf.convert",
+        side_effect=lambda input_path, output_path: shutil.copyfile(
+            input_path, output_path
+        ),
+    )
+
+    with caplog.at_level(logging.INFO, logger="TestWorkerRecycle"):
+        loi_producer.main(
+            company_name=None,
+            logger_object=logging.getLogger("TestWorkerRecycle"),
+            settings=settings,
+        )
+
+    # every worker produces two letters before exceeding the budget of one byte
+    assert caplog.text.count("The worker has been replaced") == candidate_count // 2 - 1
+    assert f"Memory: {candidate_count} letters" in caplog.text
+    for candidate_name, basic in zip(
+        candidate_information["candidateName"], candidate_information["basic"]
+    ):
+        document_text = "".join(
+            Document(
+                tmp_path
+                / f"{candidate_name.replace(' ', '_')}{settings.output_file_ending_format}.docx"
+            ).element.body.itertext()
+        )
+        assert candidate_name in document_text
+        assert loi_producer.format_indian_number(basic) in document_text
+
+
+@pytest.mark.skipif(not SOAK_LETTERS, reason="set LOI_PRODUCER_SOAK_LETTERS to run")
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="reads the RSS from /proc"
+)
+def test_soak_memory_stays_flat(logger, fake_document_template):
+    renderer = SkeletonRenderer(template=fake_document_template)
+    memory_governor = loi_producer_memory.MemoryGovernor(
+        logger_object=logger, gc_interval=100, rss_budget_bytes=None
+    )
+    warm_up_letters = max(SOAK_LETTERS // 10, 1)
+    warm_rss_bytes = 0
+    for letter_number in range(SOAK_LETTERS):
+        renderer.render(
+            context={
+                "candidateName": f"Synthetic Candidate {letter_number}",
+                "basic": str(letter_number),
+                "candidateSignature": InlineImage(
+                    tpl=renderer.template,
+                    image_descriptor="images/candidateSignature2.png",
+                    height=Inches(0.42),
+                ),
+            }
+        )
+        renderer.template.save(io.BytesIO())
+        memory_governor.record_letter()
+        if letter_number + 1 == warm_up_letters:
+            warm_rss_bytes = loi_producer_memory.get_rss_bytes()
+
+    rss_growth_bytes = loi_producer_memory.get_rss_bytes() - warm_rss_bytes
+    assert rss_growth_bytes < SOAK_RSS_GROWTH_LIMIT_BYTES
@@ -0,0 +1,49 @@
+import locale
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loi_producer_number_format import format_indian_number, format_indian_numbers
+
+
+@pytest.mark.parametrize(
+    "value,formatted_value",
+    [
+        (0, "0"),
+        (7, "7"),
+        (999, "999"),
+        (1000, "1,000"),
+        (99999, "99,999"),
+        (800000, "8,00,000"),
+        (1234567, "12,34,567"),
+        (123456789, "12,34,56,789"),
+        (-1234567, "-12,34,567"),
+        (np.int64(250000), "2,50,000"),
+    ],
+)
+def test_format_indian_number(value, formatted_value):
+    assert format_indian_number(value) == formatted_value
+
+
+def test_format_indian_numbers():
+    column = pd.Series([800000, 0, 1234567, 800000], dtype="int64")
+    formatted_values = format_indian_numbers(column)
+    assert formatted_values.tolist() == ["8,00,000", "0", "12,34,567", "8,00,000"]
+    assert format_indian_numbers(np.array([[1000], [100000]])).shape == (2, 1)
+    assert format_indian_numbers([]).tolist() == []
+
+
+def test_format_indian_number_matches_locale():
+    previous_locale = locale.setlocale(locale.LC_NUMERIC)
+    try:
+        locale.setlocale(locale.LC_NUMERIC, "en_IN.utf8")
+    except locale.Error:
+        pytest.skip("en_IN.utf8 locale is not available")
+    try:
+        for value in (0, 999, 1000, 800000, 1234567, 123456789, -1234567):
+            assert format_indian_number(value) == locale.format_string(
+                "%d", value, grouping=True
+            )
+    finally:
+        locale.setlocale(locale.LC_NUMERIC, previous_locale)
@@ -0,0 +1,130 @@
+import dataclasses
+import json
+import pickle
+
+import pytest
+from docx.shared import Cm, Inches
+
+import loi_producer_config
+from loi_producer_settings import (
+    DEFAULT_SETTINGS,
+    LoiProducerSettings,
+    load_settings,
+    parse_length,
+    parse_settings,
+)
+
+
+def test_default_settings():
+    assert DEFAULT_SETTINGS.company_name == loi_producer_config.COMPANY_NAME
+    assert DEFAULT_SETTINGS.image_path == loi_producer_config.IMAGE_PATH
+    assert DEFAULT_SETTINGS.acceptable_image_formats == tuple(
+        loi_producer_config.ACCEPTABLE_IMAGE_FORMATS
+    )
+
+
+def test_settings_are_immutable():
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        DEFAULT_SETTINGS.company_name = "Test Company"
+
+
+def test_settings_are_picklable():
+    settings = LoiProducerSettings(company_name="Test Company")
+    assert pickle.loads(pickle.dumps(settings)) == settings
+
+
+@pytest.mark.parametrize(
+    "value,length",
+    [
+        ("2.54cm", Inches(1)),
+        ("1in", Inches(1)),
+        ("3.15 cm", Cm(3.15)),
+        (914400, Inches(1)),
+        (914400.0, Inches(1)),
+        ("none", None),
+    ],
+)
+def test_parse_length(value, length):
+    assert parse_length(value) == length
+
+
+@pytest.mark.parametrize("value", ["3 furlongs", 3.15, "3.15", "0.5emu", True, False])
+def test_parse_length_invalid(value):
+    with pytest.raises(ValueError):
+        parse_length(value)
+
+
+def test_load_settings_precedence(tmp_path):
+    config_file = tmp_path / "settings.json"
+    config_file.write_text(
+        json.dumps(
+            {
+                "company_name": "File Company",
+                "image_path": "file_images/",
+                "company_logo_img_height": "2cm",
+            }
+        )
+    )
+    settings = load_settings(
+        config_file=str(config_file),
+        environment={
+            "LOI_PRODUCER_IMAGE_PATH": "env_images/",
+            "LOI_PRODUCER_ACCEPTABLE_IMAGE_FORMATS": "png, JPG",
+            "LOI_PRODUCER_RENDER_BY_EQUIVALENCE_CLASS": "false",
+            "UNRELATED_VARIABLE": "ignored",
+        },
+        overrides={"company_name": "Cli Company"},
+    )
+    assert settings.company_name == "Cli Company"
+    assert settings.image_path == "env_images/"
+    assert settings.acceptable_image_formats == ("png", "jpg")
+    assert settings.company_logo_img_height == Cm(2)
+    assert settings.render_by_equivalence_class is False
+    assert settings.output_pdf_root_path == DEFAULT_SETTINGS.output_pdf_root_path
+
+
+def test_load_settings_unknown_setting():
+    with pytest.raises(ValueError):
+        load_settings(environment={}, overrides={"companyname": "Test Company"})
+
+
+def test_parse_settings():
+    settings = parse_settings(
+        ["--company-name", "Test Company", "--set", "output_pdf_root_path=out/pdf/"],
+        environment={},
+    )
+    assert settings.company_name == "Test Company"
+    assert settings.output_pdf_root_path == "out/pdf/"
+
+
+def test_parse_settings_shard():
+    settings = parse_settings(
+        ["--shard", "1/3", "--set", "shard_strategy=hash"], environment={}
+    )
+    assert (settings.shard_index, settings.shard_count) == (1, 3)
+    assert settings.shard_strategy == "hash"
+    assert settings.sharded
+    assert not DEFAULT_SETTINGS.sharded
+    with pytest.raises(ValueError):
+        load_settings(environment={}, overrides={"shard_strategy": "random"})
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"shard_index": "5", "shard_count": "4"},
+        {"shard_index": "-1", "shard_count": "4"},
+        {"shard_index": "0", "shard_count": "0"},
+        {"shard_count": "0"},
+    ],
+)
+def test_load_settings_invalid_shard(overrides):
+    with pytest.raises(ValueError):
+        load_settings(environment={}, overrides=overrides)
+
+
+def test_load_settings_shard_from_separate_layers():
+    settings = load_settings(
+        environment={"LOI_PRODUCER_SHARD_INDEX": "3"}, overrides={"shard_count": "4"}
+    )
+    assert (settings.shard_index, settings.shard_count) == (3, 4)
@@ -0,0 +1,184 @@
+import json
+import os
+import subprocess
+import sys
+import zipfile
+
+import pandas as pd
+import pytest
+
+import loi_producer_shard
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs one shard in its own process, as a node of a distributed batch would.
+# docx2pdf needs Microsoft Word, so the conversion is replaced by a copy.
+SHARD_PROCESS_SCRIPT = """
+import logging
+import shutil
+import sys
+
+import loi_producer
+from loi_producer_settings import load_settings
+
+loi_producer.docx2pdf.convert = lambda input_path, output_path: shutil.copyfile(
+    input_path, output_path
+)
+settings = load_settings(overrides={"shard_index": sys.argv[1], "shard_count": sys.argv[2]})
+loi_producer.main(
+    company_name=settings.company_name,
+    logger_object=logging.getLogger("TestShard"),
+    settings=settings,
+)
+"""
+
+
+@pytest.mark.parametrize("shard,expected", [("0/1", (0, 1)), (" 3 / 4 ", (3, 4))])
+def test_parse_shard(shard, expected):
+    assert loi_producer_shard.parse_shard(shard) == expected
+
+
+@pytest.mark.parametrize("shard", ["4/4", "1", "-1/4", "a/b"])
+def test_parse_shard_invalid(shard):
+    with pytest.raises(ValueError):
+        loi_producer_shard.parse_shard(shard)
+
+
+@pytest.mark.parametrize("strategy", loi_producer_shard.SHARD_STRATEGIES)
+def test_select_shard_rows_partitions_the_batch(strategy):
+    candidate_dataframe = pd.DataFrame(
+        {"candidateName": [f"Candidate {number}" for number in range(101)]}
+    )
+    shards = [
+        loi_producer_shard.select_shard_rows(
+            candidate_dataframe, shard_index, shard_count=4, strategy=strategy
+        )
+        for shard_index in range(4)
+    ]
+    assert sorted(row for shard in shards for row in shard) == list(range(101))
+    assert all(shards)
+    assert shards == [
+        loi_producer_shard.select_shard_rows(
+            candidate_dataframe, shard_index, shard_count=4, strategy=strategy
+        )
+        for shard_index in range(4)
+    ]
+
+
+def test_select_shard_rows_range():
+    candidate_dataframe = pd.DataFrame({"candidateName": list("abcdefg")})
+    assert loi_producer_shard.select_shard_rows(
+        candidate_dataframe, 0, shard_count=2, strategy="range"
+    ) == [0, 1, 2, 3]
+
+
+def test_merge_shard_manifests_detects_missing_shard(tmp_path):
+    with pytest.raises(ValueError, match="missing"):
+        loi_producer_shard.merge_shard_manifests(str(tmp_path), shard_count=2)
+
+
+def test_shards_in_separate_processes(tmp_path):
+    (tmp_path / "document").mkdir()
+    (tmp_path / "pdf").mkdir()
+    environment = os.environ | {
+        "PYTHONPATH": ROOT_DIRECTORY,
+        "LOI_PRODUCER_DOCX_TEMPLATE_PATH": "tests/test_templates/test_loi_template.docx",
+        "LOI_PRODUCER_OUTPUT_DOCX_ROOT_PATH": f"{tmp_path}/document/",
+        "LOI_PRODUCER_OUTPUT_PDF_ROOT_PATH": f"{tmp_path}/pdf/",
+        "LOI_PRODUCER_SHARD_MANIFEST_PATH": f"{tmp_path}/shards/",
+        "LOI_PRODUCER_RENDER_CACHE_PATH": "none",
+    }
+    shard_processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", SHARD_PROCESS_SCRIPT, str(shard_index), "2"],
+            cwd=ROOT_DIRECTORY,
+            env=environment,
+            stdout=subprocess.DEVNULL,
+        )
+        for shard_index in range(2)
+    ]
+    assert [shard_process.wait() for shard_process in shard_processes] == [0, 0]
+
+    batch_manifest_path, batch_archive_path = loi_producer_shard.merge_shard_manifests(
+        str(tmp_path / "shards"), shard_count=2
+    )
+    with open(batch_manifest_path) as batch_manifest_file:
+        batch_manifest = json.load(batch_manifest_file)
+    candidate_count = batch_manifest["candidate_count"]
+    assert [row["row"] for row in batch_manifest["rows"]] == list(
+        range(candidate_count)
+    )
+    with zipfile.ZipFile(batch_archive_path) as batch_archive:
+        assert len(batch_archive.namelist()) == 2 * candidate_count
+
+    os.remove(tmp_path / "shards" / "shard-0001-of-0002.json")
+    with pytest.raises(ValueError, match="missing"):
+        loi_producer_shard.merge_shard_manifests(
+            str(tmp_path / "shards"), shard_count=2
+        )
+
+
+def write_fake_shards(tmp_path, candidate_names_of_shards):
+    candidate_sheet_path = tmp_path / "candidates.xlsx"
+    candidate_sheet_path.write_bytes(b"fake candidate sheet")
+    candidate_count = sum(map(len, candidate_names_of_shards))
+    row = 0
+    for shard_index, candidate_names in enumerate(candidate_names_of_shards):
+        produced_files = {}
+        for candidate_name in candidate_names:
+            shard_directory = tmp_path / f"shard-{shard_index}"
+            shard_directory.mkdir(exist_ok=True)
+            file_path = shard_directory / f"{candidate_name}_LOI.pdf"
+            file_path.write_text(f"LOI of row {row}")
+            produced_files[row] = {"pdf": str(file_path)}
+            row += 1
+        loi_producer_shard.write_shard_manifest(
+            manifest_directory=str(tmp_path / "shards"),
+            shard_index=shard_index,
+            shard_count=len(candidate_names_of_shards),
+            strategy="range",
+            candidate_sheet_path=str(candidate_sheet_path),
+            candidate_count=candidate_count,
+            produced_files=produced_files,
+        )
+    return str(tmp_path / "shards")
+
+
+def test_merge_shard_manifests_rejects_duplicate_members(tmp_path):
+    manifest_directory = write_fake_shards(tmp_path, [["A", "B"], ["B"]])
+    with pytest.raises(ValueError, match="both produced pdf/B_LOI.pdf"):
+        loi_producer_shard.merge_shard_manifests(manifest_directory, shard_count=2)
+
+
+def test_write_shard_manifest_rejects_duplicate_members(tmp_path):
+    file_path = tmp_path / "A_LOI.pdf"
+    file_path.write_text("LOI")
+    with pytest.raises(ValueError, match="both produced"):
+        loi_producer_shard.write_shard_manifest(
+            manifest_directory=str(tmp_path / "shards"),
+            shard_index=0,
+            shard_count=1,
+            strategy="range",
+            candidate_sheet_path=str(file_path),
+            candidate_count=2,
+            produced_files={0: {"pdf": str(file_path)}, 1: {"pdf": str(file_path)}},
+        )
+
+
+def test_merge_shard_manifests_verifies_digests(tmp_path):
+    manifest_directory = write_fake_shards(tmp_path, [["A"], ["B"]])
+    loi_producer_shard.merge_shard_manifests(manifest_directory, shard_count=2)
+
+    with zipfile.ZipFile(
+        os.path.join(manifest_directory, "shard-0001-of-0002.zip"), "w"
+    ) as tampered_archive:
+        tampered_archive.writestr("pdf/B_LOI.pdf", "another LOI")
+    with pytest.raises(ValueError, match="does not match the manifest"):
+        loi_producer_shard.merge_shard_manifests(manifest_directory, shard_count=2)
+
+    with zipfile.ZipFile(
+        os.path.join(manifest_directory, "shard-0001-of-0002.zip"), "w"
+    ):
+        pass
+    with pytest.raises(ValueError, match="are missing from"):
+        loi_producer_shard.merge_shard_manifests(manifest_directory, shard_count=2)
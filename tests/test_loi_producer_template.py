@@ -0,0 +1,152 @@
+import pytest
+from docx import Document
+from docx.shared import Inches
+from docxtpl import DocxTemplate, InlineImage, RichText
+
+import loi_producer_template
+
+
+@pytest.fixture()
+def structural_template_path(tmp_path):
+    document = Document()
+    document.add_paragraph("Dear {{ candidateName }},")
+    document.add_paragraph("{% if hra != '0' %}Your HRA is {{ hra }}.{% endif %}")
+    document.add_paragraph("Basic: {{ basic|upper }}")
+    template_path = tmp_path / "structural_template.docx"
+    document.save(template_path)
+    return str(template_path)
+
+
+def test_analyse_template(structural_template_path):
+    analysis = loi_producer_template.analyse_template(
+        DocxTemplate(structural_template_path)
+    )
+    assert analysis.structural_variables == {"hra", "basic"}
+    assert analysis.substitution_variables == {"candidateName"}
+    assert analysis.variables == {"hra", "basic", "candidateName"}
+
+
+def test_analyse_template_core_properties(tmp_path):
+    document = Document()
+    document.add_paragraph("Dear {{ candidateName }},")
+    document.core_properties.title = "LOI {{ employeeCode }}"
+    document.core_properties.subject = "{% if location %}{{ location }}{% endif %}"
+    template_path = tmp_path / "properties_template.docx"
+    document.save(template_path)
+
+    analysis = loi_producer_template.analyse_template(DocxTemplate(str(template_path)))
+
+    if hasattr(DocxTemplate, "render_properties"):
+        assert analysis.structural_variables == {"location"}
+        assert analysis.substitution_variables == {"candidateName", "employeeCode"}
+    else:  # the core properties are not rendered by this version of docxtpl
+        assert analysis.variables == {"candidateName"}
+
+
+def test_skeleton_renderer_matches_render(fake_document_template):
+    template_path = fake_document_template.template_file
+    expected_template = DocxTemplate(template_path)
+    renderer = loi_producer_template.SkeletonRenderer(DocxTemplate(template_path))
+
+    for candidate_number in range(3):
+        for template in (expected_template, renderer.template):
+            context = {
+                "candidateName": f"Test Candidate & <{candidate_number}>",
+                "companyAddress": "Line 1\nLine 2",
+                "companyLogo": InlineImage(
+                    tpl=template, image_descriptor="images/logo.png", height=Inches(1)
+                ),
+                "webSiteLink": RichText("Test Company Website", bold=True),
+            }
+            if template is expected_template:
+                expected_template.render(context=context)
+            else:
+                renderer.render(context=context)
+        assert renderer.template.get_xml() == expected_template.get_xml()
+
+    assert renderer.skeleton_renders == 1
+    assert renderer.substitution_renders == 3
+
+
+def test_skeleton_renderer_equivalence_classes(structural_template_path, tmp_path):
+    renderer = loi_producer_template.SkeletonRenderer(
+        DocxTemplate(structural_template_path)
+    )
+    contexts = [
+        {"candidateName": "A", "hra": "0", "basic": "x"},
+        {"candidateName": "B", "hra": "1,000", "basic": "x"},
+        {"candidateName": "C", "hra": "0", "basic": "x"},
+    ]
+    for context in contexts:
+        expected_template = DocxTemplate(structural_template_path)
+        expected_template.render(context=context)
+        renderer.render(context=context)
+        assert renderer.template.get_xml() == expected_template.get_xml()
+
+    assert renderer.skeleton_renders == 2
+    assert renderer.substitution_renders == 3
+
+    # equal values of different types render differently
+    document = Document()
+    document.add_paragraph("{{ x|string }} / {% if x %}yes{% endif %}")
+    template_path = str(tmp_path / "typed_template.docx")
+    document.save(template_path)
+    renderer = loi_producer_template.SkeletonRenderer(DocxTemplate(template_path))
+    for value in (1, 1.0, True, (1,), (1.0,)):
+        expected_template = DocxTemplate(template_path)
+        expected_template.render(context={"x": value})
+        renderer.render(context={"x": value})
+        assert renderer.template.get_xml() == expected_template.get_xml()
+    assert renderer.skeleton_renders == 5
+
+
+def test_skeleton_renderer_image_in_condition(tmp_path):
+    document = Document()
+    document.add_paragraph("{% if companyLogo %}{{ companyLogo }}{% endif %}")
+    document.add_paragraph("Dear {{ candidateName }},")
+    template_path = str(tmp_path / "image_template.docx")
+    document.save(template_path)
+    renderer = loi_producer_template.SkeletonRenderer(DocxTemplate(template_path))
+    assert renderer.analysis.structural_variables == {"companyLogo"}
+
+    for candidate_name in ("A", "B"):
+        expected_template = DocxTemplate(template_path)
+        for template in (expected_template, renderer.template):
+            context = {
+                "candidateName": candidate_name,
+                "companyLogo": InlineImage(
+                    tpl=template, image_descriptor="images/logo.png", height=Inches(1)
+                ),
+            }
+            if template is expected_template:
+                expected_template.render(context=context)
+            else:
+                renderer.render(context=context)
+        assert renderer.template.get_xml() == expected_template.get_xml()
+        renderer.template.save(str(tmp_path / f"{candidate_name}.docx"))
+        assert (
+            len(Document(str(tmp_path / f"{candidate_name}.docx")).inline_shapes) == 1
+        )
+
+    assert renderer.skeleton_renders == 0
+    assert renderer.fallback_renders == 2
+
+
+def test_skeleton_renderer_without_docxtpl_internals(mocker, structural_template_path):
+    mocker.patch.object(
+        loi_producer_template,
+        "SKELETON_RENDERER_REQUIRED_ATTRIBUTES",
+        ("render_init", "an_internal_of_another_docxtpl_version"),
+    )
+    renderer = loi_producer_template.SkeletonRenderer(
+        DocxTemplate(structural_template_path)
+    )
+    context = {"candidateName": "A", "hra": "1,000", "basic": "x"}
+    expected_template = DocxTemplate(structural_template_path)
+    expected_template.render(context=context)
+    renderer.render(context=context)
+
+    assert not renderer.supported
+    assert renderer.template.get_xml() == expected_template.get_xml()
+    assert renderer.skeleton_renders == 0
+    assert renderer.fallback_renders == 1